@@ -45,6 +45,9 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
+    'listandcart.metrics.MetricsMiddleware',
+    'listandcart.tracing.TracingMiddleware',
+    'listandcart.compression.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -52,6 +55,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'listandcart.routers.ReadYourWritesMiddleware',
 ]
 
 ROOT_URLCONF = 'ecommerce.urls'
@@ -101,10 +105,80 @@ DATABASES = {
     }
 }
 
+# Read-only endpoints (catalog, cart and order history) read from a replica
+# when one is configured. DJANGO_DB_ENGINE=sqlite stands the replica in with
+# a second connection to the primary's SQLite file: the routing runs, and
+# replica reads see everything written to the primary (nothing has to
+# migrate or copy a separate file).
+
+if os.environ.get('DJANGO_DB_ENGINE') == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+        },
+        'replica': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+            'TEST': {'MIRROR': 'default'},
+        },
+    }
+elif os.environ.get('DATABASE_REPLICA_HOST'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': os.environ['DATABASE_REPLICA_HOST'],
+        'PORT': os.environ.get('DATABASE_REPLICA_PORT', DATABASES['default']['PORT']),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['listandcart.routers.PrimaryReplicaRouter']
+DATABASE_REPLICA_ALIAS = 'replica'
+# Seconds a client keeps reading from the primary after a write.
+DATABASE_REPLICA_PIN_SECONDS = 5
+# Seconds a replica connection check is trusted: a reachable replica is not
+# checked again, and an unreachable one is not retried, until they pass.
+DATABASE_REPLICA_RETRY_SECONDS = 30
+
 CORS_ALLOW_ALL_ORIGINS = True
 
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('DJANGO_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('DJANGO_CACHE_LOCATION', 'ecommerce'),
+    }
+}
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# Absolute prefix for media URLs in API responses (e.g. a CDN). When unset,
+# URLs are built from the request's scheme and host.
+
+MEDIA_CDN_URL = os.environ.get('MEDIA_CDN_URL') or None
+
+# Media serving: content-hashed files are cached as immutable, other files for
+# MEDIA_CACHE_MAX_AGE seconds. MEDIA_SENDFILE hands file transfer to the front
+# proxy: 'x-accel-redirect' (nginx, internal location at
+# MEDIA_ACCEL_REDIRECT_PREFIX) or 'x-sendfile' (Apache, lighttpd).
+
+MEDIA_CACHE_MAX_AGE = 3600
+MEDIA_SENDFILE = os.environ.get('MEDIA_SENDFILE') or None
+MEDIA_ACCEL_REDIRECT_PREFIX = '/protected-media/'
+
+# Product images are stored once per distinct content; collect_image_garbage
+# leaves files younger than IMAGE_GC_GRACE_SECONDS alone.
+
+IMAGE_GC_GRACE_SECONDS = 3600
+
+# Resized WebP variants of product images, rendered on a background pool
+
+IMAGE_VARIANT_SIZES = {'thumb': 200, 'medium': 800}
+IMAGE_VARIANT_QUALITY = 80
+IMAGE_VARIANT_WORKERS = 2
+IMAGE_VARIANT_MAX_PENDING = 100
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -145,3 +219,64 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Route the read endpoints to native async views; ecommerce/asgi.py turns this
+# on for the ASGI deployment.
+
+API_ASYNC_VIEWS = os.environ.get('API_ASYNC_VIEWS', '0') == '1'
+
+# API pagination
+
+API_PAGE_SIZE = 50
+API_MAX_PAGE_SIZE = 200
+CATALOG_STREAM_CHUNK_SIZE = 500
+
+# Catalog page cache: entries are rebuilt by one worker after CATALOG_CACHE_TTL
+# while the others keep serving the stale body for up to CATALOG_CACHE_STALE_TTL.
+
+CATALOG_CACHE_TTL = 300
+CATALOG_CACHE_STALE_TTL = 60
+CATALOG_CACHE_LOCK_TIMEOUT = 10
+
+# Response compression: JSON bodies of at least COMPRESSION_MIN_SIZE bytes are
+# gzip- or brotli-encoded per Accept-Encoding (brotli needs the brotli package).
+# Cached catalog pages are stored precompressed at maximum level instead.
+
+COMPRESSION_MIN_SIZE = 200
+COMPRESSION_GZIP_LEVEL = 6
+COMPRESSION_BROTLI_QUALITY = 5
+
+# Queued checkout: with ORDER_CHECKOUT_QUEUE on, orders/place/ snapshots the
+# cart into an OrderJob and answers 202 with a ticket to poll at
+# orders/status/<ticket>/. `manage.py process_orders` places the orders on a
+# pool of ORDER_WORKER_CONCURRENCY threads or processes, claiming
+# ORDER_WORKER_BATCH_SIZE jobs at a time. Jobs claimed longer than
+# ORDER_JOB_LEASE_SECONDS ago are claimed again, up to ORDER_JOB_MAX_ATTEMPTS
+# times.
+
+ORDER_CHECKOUT_QUEUE = os.environ.get('ORDER_CHECKOUT_QUEUE', '0') == '1'
+ORDER_WORKER_POOL = 'thread'
+ORDER_WORKER_CONCURRENCY = 4
+ORDER_WORKER_BATCH_SIZE = 50
+ORDER_WORKER_POLL_SECONDS = 1.0
+ORDER_JOB_LEASE_SECONDS = 300
+ORDER_JOB_MAX_ATTEMPTS = 3
+
+PRODUCT_IMPORT_BATCH_SIZE = 1000
+CART_BATCH_MAX_OPERATIONS = 500
+
+# Token authentication cache (per process)
+
+TOKEN_AUTH_CACHE_SIZE = 1024
+TOKEN_AUTH_CACHE_TTL = 60
+
+# Request tracing: a request is traced when sampled at TRACE_SAMPLE_RATE or
+# when it takes at least TRACE_SLOW_MS (None disables the latency trigger).
+# Traces are appended to a rotating JSONL file by a background thread.
+
+TRACE_SAMPLE_RATE = float(os.environ.get('TRACE_SAMPLE_RATE', 0))
+TRACE_SLOW_MS = None
+TRACE_LOG_FILE = os.path.join(BASE_DIR, 'logs', 'traces.jsonl')
+TRACE_LOG_MAX_BYTES = 10 * 1024 * 1024
+TRACE_LOG_BACKUP_COUNT = 5
+TRACE_QUEUE_SIZE = 10000
@@ -0,0 +1,162 @@
+from functools import wraps
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from django.views.decorators.csrf import csrf_exempt
+
+from .authentication import token_required
+from .catalog_cache import acached_catalog_page
+from .compression import encoded_response, negotiate_encoding
+from .models import Product
+from .responses import JsonResponse, dumps
+from .revisions import acart_revisions, acatalog_version, aorder_revisions
+from .routers import replica_reads
+from .serializers import CART_LINE_FIELDS, PRODUCT_FIELDS, media_urls, parse_fields, product_data
+from .views import (
+    _cart_body, _cart_rows, _etag, _order_history_body, _order_history_query,
+    _product_page_body, _product_page_query
+)
+
+
+def async_etag(etag_func):
+    """``django.views.decorators.http.etag`` for an awaitable ``etag_func``."""
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            etag = quote_etag(await etag_func(request))
+            response = get_conditional_response(request, etag=etag)
+            if response is None:
+                response = await view(request, *args, **kwargs)
+            if request.method in ('GET', 'HEAD'):
+                response.headers.setdefault('ETag', etag)
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+async def _catalog_version(request):
+    if not hasattr(request, '_catalog_version'):
+        request._catalog_version = await acatalog_version()
+    return request._catalog_version
+
+
+async def _catalog_etag(request):
+    return _etag('catalog', await _catalog_version(request), request.get_host(), request.get_full_path())
+
+
+async def _cart_etag(request):
+    return _etag(
+        'cart', request.user.id, *await acart_revisions(request.user.id),
+        request.get_host(), request.get_full_path()
+    )
+
+
+async def _order_history_etag(request):
+    return _etag(
+        'orders', request.user.id, *await aorder_revisions(request.user.id), request.get_full_path()
+    )
+
+
+async def _stream_products(request, fields):
+    chunk_size = getattr(settings, 'CATALOG_STREAM_CHUNK_SIZE', 500)
+    media = media_urls(request)
+    last_id = 0
+    separator = b''
+    yield b'['
+    while True:
+        chunk = Product.objects.filter(id__gt=last_id).only(*fields).order_by('id')[:chunk_size]
+        count = 0
+        parts = []
+        async for product in chunk:
+            parts.append(separator + dumps(product_data(product, media, fields)))
+            separator = b','
+            last_id = product.id
+            count += 1
+        if parts:
+            yield b''.join(parts)
+        if count < chunk_size:
+            break
+    yield b']'
+
+
+@csrf_exempt
+@replica_reads
+@async_etag(_catalog_etag)
+async def product_list(request):
+    if request.method == 'GET':
+        try:
+            fields = parse_fields(request, PRODUCT_FIELDS)
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+
+        if request.GET.get('stream') in ('1', 'true'):
+            return StreamingHttpResponse(
+                _stream_products(request, fields),
+                content_type='application/json'
+            )
+
+        try:
+            products, limit, variant = _product_page_query(request, fields)
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+
+        async def build_page():
+            page = [product async for product in products[:limit + 1]]
+            return _product_page_body(request, page, limit, fields)
+
+        encoding = negotiate_encoding(request)
+        body = await acached_catalog_page(variant, build_page, encoding, await _catalog_version(request))
+        return encoded_response(body, encoding)
+
+    return JsonResponse({'error': 'Only GET method is allowed'}, status=405)
+
+
+@csrf_exempt
+@token_required
+@replica_reads
+@async_etag(_cart_etag)
+async def view_cart(request):
+    if request.method == 'GET':
+        try:
+            try:
+                fields = parse_fields(request, CART_LINE_FIELDS)
+            except ValueError as e:
+                return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+            rows = [row async for row in _cart_rows(request.user, fields)]
+            return JsonResponse(_cart_body(request, rows, fields))
+
+        except Exception as e:
+            return JsonResponse({
+                'success': False,
+                'error': str(e)
+            }, status=500)
+
+    return JsonResponse({
+        'error': 'Only GET method is allowed'
+    }, status=405)
+
+
+@csrf_exempt
+@token_required
+@replica_reads
+@async_etag(_order_history_etag)
+async def order_history(request):
+    if request.method == 'GET':
+        try:
+            try:
+                orders, limit, fields = _order_history_query(request, request.user)
+            except ValueError as e:
+                return JsonResponse({'error': str(e)}, status=400)
+
+            page = [order async for order in orders[:limit + 1]]
+            return JsonResponse(_order_history_body(page, limit, fields))
+
+        except Exception as e:
+            return JsonResponse({'error': str(e)}, status=500)
+
+    return JsonResponse({'error': 'Only GET method is allowed'}, status=405)
@@ -0,0 +1,130 @@
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.http import JsonResponse
+from rest_framework.authtoken.models import Token
+
+
+class TokenCache:
+    """Bounded LRU of token key -> user with a per-entry TTL.
+
+    The cache is per process; signal handlers drop entries when a token or
+    its user changes, and the TTL bounds staleness seen by other workers.
+    """
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            user, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return user
+
+    def set(self, key, user):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (user, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def discard_user(self, user_id):
+        with self._lock:
+            stale = [key for key, (user, _) in self._entries.items() if user.pk == user_id]
+            for key in stale:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+token_cache = TokenCache(
+    max_size=getattr(settings, 'TOKEN_AUTH_CACHE_SIZE', 1024),
+    ttl=getattr(settings, 'TOKEN_AUTH_CACHE_TTL', 60),
+)
+
+
+def resolve_token(key):
+    user = token_cache.get(key)
+    if user is None:
+        try:
+            token = Token.objects.select_related('user').get(key=key)
+        except Token.DoesNotExist:
+            return None
+        user = token.user
+        token_cache.set(key, user)
+    return user
+
+
+async def aresolve_token(key):
+    user = token_cache.get(key)
+    if user is None:
+        try:
+            token = await Token.objects.select_related('user').aget(key=key)
+        except Token.DoesNotExist:
+            return None
+        user = token.user
+        token_cache.set(key, user)
+    return user
+
+
+def _header_token(request):
+    auth_header = request.headers.get('Authorization')
+    if not auth_header or not auth_header.startswith('Token '):
+        return None
+    return auth_header[len('Token '):].strip()
+
+
+def _unauthorized(error):
+    return JsonResponse({'success': False, 'error': error}, status=401)
+
+
+def token_required(view):
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            key = _header_token(request)
+            if key is None:
+                return _unauthorized('Token authentication required')
+            user = await aresolve_token(key)
+            if user is None:
+                return _unauthorized('Invalid token')
+            request.user = user
+            return await view(request, *args, **kwargs)
+
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        key = _header_token(request)
+        if key is None:
+            return _unauthorized('Token authentication required')
+
+        user = resolve_token(key)
+        if user is None:
+            return _unauthorized('Invalid token')
+
+        request.user = user
+        return view(request, *args, **kwargs)
+
+    return wrapper
@@ -0,0 +1,76 @@
+from django.db import connection, transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Sum
+
+from .models import Cart, CartSummary
+
+_line_total = ExpressionWrapper(
+    F('product__price') * F('quantity'),
+    output_field=DecimalField(max_digits=12, decimal_places=2)
+)
+
+
+def apply_cart_delta(user_id, lines=0, amount=0):
+    """Adjust a user's cart summary in place after a cart write.
+
+    A user without a summary row yet gets one rebuilt from the Cart table,
+    which already reflects the write.
+    """
+    updated = CartSummary.objects.filter(user_id=user_id).update(
+        line_count=F('line_count') + lines,
+        total=F('total') + amount,
+    )
+    if not updated:
+        rebuild_cart_summaries([user_id])
+
+
+def _computed_summaries(user_ids=None):
+    lines = Cart.objects.all()
+    if user_ids is not None:
+        lines = lines.filter(user_id__in=user_ids)
+    rows = lines.values('user_id').annotate(line_count=Count('id'), total=Sum(_line_total)).order_by()
+    return {row['user_id']: (row['line_count'], row['total']) for row in rows}
+
+
+def rebuild_cart_summaries(user_ids=None, batch_size=1000):
+    """Recompute summaries from the Cart table for ``user_ids`` (all users
+    when None) with one grouped query and bulk upserts.
+    """
+    computed = _computed_summaries(user_ids)
+    if user_ids is not None:
+        for user_id in user_ids:
+            computed.setdefault(user_id, (0, 0))
+
+    upsert = {'update_conflicts': True, 'update_fields': ['line_count', 'total']}
+    if connection.features.supports_update_conflicts_with_target:
+        upsert['unique_fields'] = ['user']
+    with transaction.atomic():
+        if user_ids is None:
+            CartSummary.objects.exclude(
+                user_id__in=Cart.objects.values('user_id')
+            ).update(line_count=0, total=0)
+        CartSummary.objects.bulk_create(
+            [
+                CartSummary(user_id=user_id, line_count=line_count, total=total or 0)
+                for user_id, (line_count, total) in computed.items()
+            ],
+            batch_size=batch_size,
+            **upsert
+        )
+    return len(computed)
+
+
+def find_inconsistent_summaries():
+    """Return ``{user_id: (stored, expected)}`` for summaries that disagree
+    with the Cart table."""
+    computed = _computed_summaries()
+    stored = {
+        summary.user_id: (summary.line_count, summary.total)
+        for summary in CartSummary.objects.all()
+    }
+    mismatches = {}
+    for user_id in computed.keys() | stored.keys():
+        expected_count, expected_total = computed.get(user_id, (0, 0))
+        count, total = stored.get(user_id, (0, 0))
+        if count != expected_count or (total or 0) != (expected_total or 0):
+            mismatches[user_id] = ((count, total), (expected_count, expected_total))
+    return mismatches
@@ -0,0 +1,107 @@
+import asyncio
+import hashlib
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+from .compression import compress, precompressed_variants
+from .revisions import acatalog_version, catalog_version
+
+
+def _page_key(version, variant):
+    digest = hashlib.md5(variant.encode()).hexdigest()
+    return f'catalog:page:{version}:{digest}'
+
+
+def _encoded(entry, encoding):
+    if encoding is None:
+        return entry['body']
+    body = entry.get('encoded', {}).get(encoding)
+    return body if body is not None else compress(entry['body'], encoding)
+
+
+def cached_catalog_page(variant, build, encoding=None, version=None):
+    """Return the serialized catalog page for ``variant``, building it at most
+    once per catalog version.
+
+    ``variant`` identifies the page (host, cursor, limit, ...) and ``build``
+    returns its body as bytes. When an entry goes stale only the worker that
+    wins the rebuild lock calls ``build``; the others serve the stale body,
+    or wait briefly for the winner when there is nothing to serve yet.
+
+    Entries keep the body precompressed in every available coding next to
+    the raw bytes; ``encoding`` selects which of them is returned. Pass the
+    catalog ``version`` when the caller has already read it.
+    """
+    ttl = getattr(settings, 'CATALOG_CACHE_TTL', 300)
+    stale_ttl = getattr(settings, 'CATALOG_CACHE_STALE_TTL', 60)
+    lock_timeout = getattr(settings, 'CATALOG_CACHE_LOCK_TIMEOUT', 10)
+
+    key = _page_key(catalog_version() if version is None else version, variant)
+    entry = cache.get(key)
+    if entry is not None and entry['fresh_until'] > time.time():
+        return _encoded(entry, encoding)
+
+    lock_key = f'{key}:lock'
+    if cache.add(lock_key, 1, lock_timeout):
+        try:
+            entry = {'body': build(), 'fresh_until': time.time() + ttl}
+            entry['encoded'] = precompressed_variants(entry['body'])
+            cache.set(key, entry, ttl + stale_ttl)
+        finally:
+            cache.delete(lock_key)
+        return _encoded(entry, encoding)
+
+    if entry is not None:
+        return _encoded(entry, encoding)
+
+    deadline = time.monotonic() + lock_timeout
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        entry = cache.get(key)
+        if entry is not None:
+            return _encoded(entry, encoding)
+        if cache.get(lock_key) is None:
+            break
+    body = build()
+    return body if encoding is None else compress(body, encoding)
+
+
+async def acached_catalog_page(variant, build, encoding=None, version=None):
+    """``cached_catalog_page`` on the async cache API, for async views;
+    ``build`` is a coroutine function."""
+    ttl = getattr(settings, 'CATALOG_CACHE_TTL', 300)
+    stale_ttl = getattr(settings, 'CATALOG_CACHE_STALE_TTL', 60)
+    lock_timeout = getattr(settings, 'CATALOG_CACHE_LOCK_TIMEOUT', 10)
+
+    key = _page_key(await acatalog_version() if version is None else version, variant)
+    entry = await cache.aget(key)
+    if entry is not None and entry['fresh_until'] > time.time():
+        return _encoded(entry, encoding)
+
+    lock_key = f'{key}:lock'
+    if await cache.aadd(lock_key, 1, lock_timeout):
+        try:
+            entry = {'body': await build(), 'fresh_until': time.time() + ttl}
+            # Maximum-level compression is CPU work; keep it off the event loop.
+            entry['encoded'] = await sync_to_async(precompressed_variants, thread_sensitive=False)(entry['body'])
+            await cache.aset(key, entry, ttl + stale_ttl)
+        finally:
+            await cache.adelete(lock_key)
+        return _encoded(entry, encoding)
+
+    if entry is not None:
+        return _encoded(entry, encoding)
+
+    deadline = time.monotonic() + lock_timeout
+    while time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+        entry = await cache.aget(key)
+        if entry is not None:
+            return _encoded(entry, encoding)
+        if await cache.aget(lock_key) is None:
+            break
+    body = await build()
+    return body if encoding is None else compress(body, encoding)
@@ -0,0 +1,156 @@
+import gzip
+from gzip import GzipFile
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.text import StreamingBuffer, compress_sequence
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def available_encodings():
+    """Supported content codings, most preferred first."""
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def _accepted(header):
+    weights = {}
+    for part in header.split(','):
+        name, _, params = part.partition(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        weight = 1.0
+        for param in params.split(';'):
+            key, _, value = param.partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[name] = weight
+    return weights
+
+
+def negotiate_encoding(request, encodings=None):
+    """Pick the coding for the response from ``Accept-Encoding``, or None."""
+    weights = _accepted(request.headers.get('Accept-Encoding', ''))
+    best, best_weight = None, 0.0
+    for encoding in encodings or available_encodings():
+        weight = weights.get(encoding, weights.get('*', 0.0))
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+
+def compress(body, encoding, precompress=False):
+    """Encode ``body`` with ``encoding``.
+
+    ``precompress`` trades CPU for size, for bodies that are compressed once
+    and served many times.
+    """
+    if encoding == 'gzip':
+        level = 9 if precompress else getattr(settings, 'COMPRESSION_GZIP_LEVEL', 6)
+        return gzip.compress(body, compresslevel=level, mtime=0)
+    if encoding == 'br':
+        quality = 11 if precompress else getattr(settings, 'COMPRESSION_BROTLI_QUALITY', 5)
+        return brotli.compress(body, quality=quality)
+    raise ValueError(f'Unsupported encoding: {encoding}')
+
+
+def precompressed_variants(body):
+    """Every available encoding of ``body``, keyed by coding."""
+    return {encoding: compress(body, encoding, precompress=True) for encoding in available_encodings()}
+
+
+def encoded_response(body, encoding, content_type='application/json'):
+    """``HttpResponse`` for a ``body`` that is already in ``encoding``."""
+    response = HttpResponse(body, content_type=content_type)
+    if encoding:
+        response['Content-Encoding'] = encoding
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
+
+
+async def _acompress_sequence(sequence):
+    # Async counterpart of django.utils.text.compress_sequence.
+    buffer = StreamingBuffer()
+    with GzipFile(mode='wb', compresslevel=6, fileobj=buffer, mtime=0) as zfile:
+        yield buffer.read()
+        async for item in sequence:
+            zfile.write(item)
+            data = buffer.read()
+            if data:
+                yield data
+    yield buffer.read()
+
+
+def _weaken_etag(response):
+    # The ETag names the identity body; an encoded one only matches weakly.
+    etag = response.get('ETag')
+    if etag and etag.startswith('"'):
+        response['ETag'] = 'W/' + etag
+
+
+class CompressionMiddleware:
+    """Compress JSON responses with the coding negotiated from
+    ``Accept-Encoding``.
+
+    Responses that already carry a ``Content-Encoding`` (precompressed cache
+    entries) pass through untouched apart from their ETag. Streamed bodies
+    are gzipped chunk by chunk.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.process_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.process_response(request, await self.get_response(request))
+
+    def process_response(self, request, response):
+        if response.status_code != 200 or not response.get('Content-Type', '').startswith('application/json'):
+            return response
+
+        if response.has_header('Content-Encoding'):
+            _weaken_etag(response)
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if response.streaming:
+            if negotiate_encoding(request, ('gzip',)):
+                if response.is_async:
+                    response.streaming_content = _acompress_sequence(response.streaming_content)
+                else:
+                    response.streaming_content = compress_sequence(response.streaming_content)
+                response['Content-Encoding'] = 'gzip'
+                del response['Content-Length']
+                _weaken_etag(response)
+            return response
+
+        if len(response.content) < getattr(settings, 'COMPRESSION_MIN_SIZE', 200):
+            return response
+        encoding = negotiate_encoding(request)
+        if encoding is None:
+            return response
+        body = compress(response.content, encoding)
+        if len(body) < len(response.content):
+            response.content = body
+            response['Content-Encoding'] = encoding
+            response['Content-Length'] = str(len(body))
+            _weaken_etag(response)
+        return response
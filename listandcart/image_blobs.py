@@ -0,0 +1,148 @@
+import os
+import posixpath
+import time
+
+from django.conf import settings
+from django.core.files import File
+from django.db import connection, transaction
+from django.db.models import Count, F
+
+from .media import is_hashed_name
+from .models import ImageBlob, Product
+from .revisions import bump_catalog_version
+
+
+def image_storage():
+    return Product._meta.get_field('image').storage
+
+
+def image_directory():
+    return Product._meta.get_field('image').upload_to.rstrip('/')
+
+
+def apply_image_refs(removed='', added=''):
+    """Move one product reference from the ``removed`` file to ``added``.
+
+    A file without a row yet gets one rebuilt from the Product table, which
+    already reflects the write.
+    """
+    if removed:
+        ImageBlob.objects.filter(name=removed).update(ref_count=F('ref_count') - 1)
+    if added:
+        updated = ImageBlob.objects.filter(name=added).update(ref_count=F('ref_count') + 1)
+        if not updated:
+            rebuild_image_refs([added])
+
+
+def _computed_refs(names=None):
+    products = Product.objects.exclude(image='')
+    if names is not None:
+        products = products.filter(image__in=names)
+    rows = products.values('image').annotate(refs=Count('id')).order_by()
+    return {row['image']: row['refs'] for row in rows}
+
+
+def rebuild_image_refs(names=None, batch_size=1000):
+    """Recompute reference counts from the Product table for ``names`` (every
+    file when None) with one grouped query and bulk upserts."""
+    computed = _computed_refs(names)
+    if names is not None:
+        for name in names:
+            computed.setdefault(name, 0)
+
+    upsert = {'update_conflicts': True, 'update_fields': ['ref_count']}
+    if connection.features.supports_update_conflicts_with_target:
+        upsert['unique_fields'] = ['name']
+    with transaction.atomic():
+        if names is None:
+            ImageBlob.objects.exclude(name__in=list(computed)).update(ref_count=0)
+        ImageBlob.objects.bulk_create(
+            [ImageBlob(name=name, ref_count=refs) for name, refs in computed.items()],
+            batch_size=batch_size,
+            **upsert
+        )
+    return len(computed)
+
+
+def _chunks(items, size=500):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _modified_before(storage, name, cutoff):
+    try:
+        return os.path.getmtime(storage.path(name)) < cutoff
+    except FileNotFoundError:
+        return False
+
+
+def collect_garbage(grace=None, dry_run=False):
+    """Delete product image files that no product references.
+
+    Files modified within ``grace`` seconds (``IMAGE_GC_GRACE_SECONDS``) are
+    kept: their reference may belong to a request still in flight. A file
+    is only removed when both its count and the Product table agree that it
+    is unreferenced, and deleting its zero-count row is what claims it: an
+    upload of the same content that lands meanwhile either holds the row
+    (its count is raised) or has refreshed the file's mtime, which is
+    checked again just before the file goes. Returns the removed names.
+    """
+    if grace is None:
+        grace = getattr(settings, 'IMAGE_GC_GRACE_SECONDS', 3600)
+    storage = image_storage()
+    directory = image_directory()
+    cutoff = time.time() - grace
+    try:
+        _, files = storage.listdir(directory)
+    except FileNotFoundError:
+        return []
+    candidates = [
+        posixpath.join(directory, file_name) for file_name in files
+        if _modified_before(storage, posixpath.join(directory, file_name), cutoff)
+    ]
+
+    removed = []
+    for names in _chunks(candidates):
+        live = set(ImageBlob.objects.filter(name__in=names, ref_count__gt=0).values_list('name', flat=True))
+        live.update(Product.objects.filter(image__in=names).values_list('image', flat=True))
+        dead = [name for name in names if name not in live]
+        if dry_run:
+            removed.extend(dead)
+            continue
+        # A file no product ever referenced has no row to claim yet.
+        ImageBlob.objects.bulk_create([ImageBlob(name=name, ref_count=0) for name in dead], ignore_conflicts=True)
+        for name in dead:
+            # A file refreshed after its row was claimed stays; the
+            # reference that refreshed it rebuilds the row.
+            claimed, _ = ImageBlob.objects.filter(name=name, ref_count__lte=0).delete()
+            if claimed and _modified_before(storage, name, cutoff):
+                storage.delete(name)
+                removed.append(name)
+    return removed
+
+
+def readdress_legacy_images():
+    """Move product images stored under upload names (before content
+    addressing) to content-addressed names. The old files become garbage.
+
+    Returns ``(moved, missing)`` product counts.
+    """
+    storage = image_storage()
+    moved = missing = 0
+    for product in Product.objects.exclude(image='').only('id', 'image').iterator():
+        old_name = product.image.name
+        if is_hashed_name(old_name):
+            continue
+        try:
+            with storage.open(old_name, 'rb') as source:
+                new_name = storage.save(old_name, File(source))
+        except FileNotFoundError:
+            missing += 1
+            continue
+        with transaction.atomic():
+            if Product.objects.filter(pk=product.pk, image=old_name).update(image=new_name):
+                apply_image_refs(removed=old_name, added=new_name)
+                moved += 1
+    if moved:
+        bump_catalog_version()
+    return moved, missing
@@ -0,0 +1,95 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from PIL import Image
+
+from .models import Product
+from .revisions import bump_catalog_version
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = threading.BoundedSemaphore(getattr(settings, 'IMAGE_VARIANT_MAX_PENDING', 100))
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'IMAGE_VARIANT_WORKERS', 2),
+                thread_name_prefix='image-variants',
+            )
+        return _executor
+
+
+def variant_name(image_name, label):
+    stem = os.path.splitext(os.path.basename(image_name))[0]
+    return f'products/variants/{stem}_{label}.webp'
+
+
+def generate_variants(product_id):
+    """Render the resized WebP variants of a product's image and record them."""
+    product = Product.objects.filter(pk=product_id).only('image').first()
+    if product is None or not product.image:
+        return
+
+    storage = product.image.storage
+    # Variants keep their derived names; only originals are content-addressed.
+    variant_storage = Product._meta.get_field('image_thumb').storage
+    image_name = product.image.name
+    sizes = getattr(settings, 'IMAGE_VARIANT_SIZES', {'thumb': 200, 'medium': 800})
+    quality = getattr(settings, 'IMAGE_VARIANT_QUALITY', 80)
+    names = {}
+    with storage.open(image_name, 'rb') as source:
+        with Image.open(source) as original:
+            original.load()
+            if original.mode not in ('RGB', 'RGBA'):
+                original = original.convert('RGBA' if 'transparency' in original.info else 'RGB')
+            for label, size in sizes.items():
+                variant = original.copy()
+                variant.thumbnail((size, size))
+                buffer = BytesIO()
+                variant.save(buffer, 'WEBP', quality=quality)
+                name = variant_name(image_name, label)
+                if variant_storage.exists(name):
+                    variant_storage.delete(name)
+                names[label] = variant_storage.save(name, ContentFile(buffer.getvalue()))
+
+    updated = Product.objects.filter(pk=product_id, image=image_name).update(
+        image_thumb=names.get('thumb', ''),
+        image_medium=names.get('medium', ''),
+    )
+    if updated:
+        bump_catalog_version()
+
+
+def _run(product_id):
+    try:
+        generate_variants(product_id)
+    except Exception:
+        logger.exception('Could not generate image variants for product %s', product_id)
+    finally:
+        close_old_connections()
+        _pending.release()
+
+
+def schedule_variants(product_id):
+    """Queue variant generation on the bounded worker pool once the current
+    transaction commits. When the queue is full the job is dropped and left
+    for ``manage.py generate_image_variants``.
+    """
+    def submit():
+        if not _pending.acquire(blocking=False):
+            logger.warning('Image variant queue full; skipping product %s', product_id)
+            return
+        _get_executor().submit(_run, product_id)
+
+    transaction.on_commit(submit)
@@ -0,0 +1,123 @@
+import csv
+import json
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+
+from .models import Product
+from .revisions import bump_catalog_version
+from .search import index_products
+
+FORMATS = ('csv', 'jsonl')
+MAX_REPORTED_ERRORS = 1000
+
+
+class ImportResult:
+    def __init__(self):
+        self.created = 0
+        self.failed = 0
+        self.errors = []
+
+    def add_error(self, line, message):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line, 'error': message})
+
+    def as_dict(self):
+        return {'created': self.created, 'failed': self.failed, 'errors': self.errors}
+
+
+def _decoded(lines):
+    for line in lines:
+        yield line.decode('utf-8') if isinstance(line, bytes) else line
+
+
+def iter_rows(lines, fmt):
+    """Yield ``(line_number, row, error)`` for each record of a CSV or JSONL stream."""
+    lines = _decoded(lines)
+    if fmt == 'csv':
+        reader = csv.DictReader(lines)
+        try:
+            for row in reader:
+                yield reader.line_num, row, None
+        except csv.Error as e:
+            yield reader.line_num, None, f'Invalid CSV, import stopped: {e}'
+        return
+
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield line_number, None, f'Invalid JSON: {e}'
+            continue
+        if not isinstance(row, dict):
+            yield line_number, None, 'Each line must be a JSON object'
+            continue
+        yield line_number, row, None
+
+
+def build_product(row):
+    name = str(row.get('name') or '').strip()
+    description = str(row.get('description') or '').strip()
+    if not name or row.get('price') in (None, '') or not description:
+        raise ValueError('Name, price, and description are required')
+    if len(name) > Product._meta.get_field('name').max_length:
+        raise ValueError('Name is too long')
+
+    try:
+        price = Decimal(str(row['price']).strip())
+    except InvalidOperation:
+        raise ValueError('Price must be a number')
+    if not price.is_finite() or price < 0 or price != price.quantize(Decimal('0.01')):
+        raise ValueError('Price must be a non-negative amount with at most 2 decimal places')
+    if price >= Decimal('1e8'):
+        raise ValueError('Price is too large')
+
+    return Product(name=name, price=price, description=description)
+
+
+def _insert(batch):
+    with transaction.atomic():
+        last_id = Product.objects.aggregate(last_id=Max('id'))['last_id'] or 0
+        created = Product.objects.bulk_create(batch)
+        if created and created[0].pk is None:
+            # Backends that cannot return ids from a bulk INSERT (MySQL):
+            # pick the new rows up by id; re-indexing a concurrent insert
+            # along the way is harmless.
+            created = list(Product.objects.filter(id__gt=last_id).only('id', 'name', 'description'))
+        index_products(created)
+
+
+def import_products(lines, fmt, batch_size=None):
+    """Validate and insert products from ``lines`` in ``bulk_create`` batches.
+
+    Invalid rows are reported in the result and skipped; each batch commits
+    in its own transaction so one bad row never aborts the file.
+    """
+    batch_size = batch_size or getattr(settings, 'PRODUCT_IMPORT_BATCH_SIZE', 1000)
+    result = ImportResult()
+    batch = []
+    for line_number, row, error in iter_rows(lines, fmt):
+        if error is None:
+            try:
+                batch.append(build_product(row))
+            except ValueError as e:
+                error = str(e)
+        if error is not None:
+            result.add_error(line_number, error)
+            continue
+        if len(batch) >= batch_size:
+            _insert(batch)
+            result.created += len(batch)
+            batch = []
+
+    if batch:
+        _insert(batch)
+        result.created += len(batch)
+    if result.created:
+        bump_catalog_version()
+    return result
@@ -0,0 +1,231 @@
+import json
+import random
+import threading
+import time
+import uuid
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client
+from rest_framework.authtoken.models import Token
+
+from listandcart.benchmarking import latency_summary, run_metadata, write_results
+from listandcart.metrics import QueryCounter, observe_queries
+from listandcart.models import Cart, Product
+
+from .seed_data import SEED_PASSWORD
+
+API = '/api/'
+
+# ``request(worker)`` returns (method, path, kwargs) for one client call;
+# ``prepare(worker)`` runs untimed before it, e.g. to put something in the cart.
+Scenario = namedtuple('Scenario', 'name request prepare writes', defaults=(None, False))
+
+
+class Worker:
+    def __init__(self, user, token, staff_token, product_ids, seed):
+        host = next((h for h in settings.ALLOWED_HOSTS if h != '*' and not h.startswith('.')), 'localhost')
+        self.client = Client(HTTP_HOST=host, raise_request_exception=False)
+        self.user = user
+        self.headers = {'HTTP_AUTHORIZATION': f'Token {token}'}
+        self.staff_headers = {'HTTP_AUTHORIZATION': f'Token {staff_token}'}
+        self.product_ids = product_ids
+        self.rng = random.Random(seed)
+        self.path = None
+
+    def product_id(self):
+        return self.rng.choice(self.product_ids)
+
+    def add_to_cart(self, product_id=None):
+        self.client.post(
+            f'{API}cart/add/', json.dumps({'product_id': product_id or self.product_id(), 'quantity': 1}),
+            content_type='application/json', **self.headers,
+        )
+
+
+def _json(worker, method, path, body):
+    return method, path, {'data': json.dumps(body), 'content_type': 'application/json', **worker.headers}
+
+
+def _prepare_remove(worker):
+    product_id = worker.product_id()
+    worker.add_to_cart(product_id)
+    item_id = Cart.objects.filter(user=worker.user, product_id=product_id).values_list('id', flat=True).first()
+    worker.path = f'{API}cart/remove/{item_id}/'
+
+
+def _prepare_order(worker):
+    for _ in range(3):
+        worker.add_to_cart()
+
+
+def _import_feed(worker):
+    feed = 'name,price,description\n' + ''.join(
+        f'Bench import {uuid.uuid4().hex[:8]},{worker.rng.randrange(100, 10000) / 100},Imported by bench_api\n'
+        for _ in range(20)
+    )
+    return 'post', f'{API}products/import/', {'data': feed, 'content_type': 'text/csv', **worker.staff_headers}
+
+
+SCENARIOS = [
+    Scenario('products', lambda w: ('get', f'{API}products/', {})),
+    Scenario('products_page', lambda w: ('get', f'{API}products/', {'data': {'limit': 20}})),
+    Scenario('products_stream', lambda w: ('get', f'{API}products/', {'data': {'stream': 1}})),
+    Scenario('search', lambda w: ('get', f'{API}products/search/', {'data': {'q': w.rng.choice(['speaker', 'smart', 'lamp'])}})),
+    Scenario('cart', lambda w: ('get', f'{API}cart/', w.headers)),
+    Scenario('cart_summary', lambda w: ('get', f'{API}cart/summary/', w.headers)),
+    Scenario('order_history', lambda w: ('get', f'{API}orders/history/', w.headers)),
+    Scenario('order_history_summary', lambda w: ('get', f'{API}orders/history/', {'data': {'summary': 1}, **w.headers})),
+    Scenario('metrics', lambda w: ('get', f'{API}metrics', w.staff_headers)),
+    Scenario(
+        'login',
+        lambda w: _json(w, 'post', f'{API}auth/login/', {'username': w.user.username, 'password': SEED_PASSWORD}),
+    ),
+    Scenario('cart_add', lambda w: _json(w, 'post', f'{API}cart/add/', {'product_id': w.product_id(), 'quantity': 1}), writes=True),
+    Scenario(
+        'cart_update',
+        lambda w: _json(w, 'put', f'{API}cart/update/{w.product_id()}/', {'quantity': w.rng.randint(1, 5)}),
+        writes=True,
+    ),
+    Scenario(
+        'cart_batch',
+        lambda w: _json(w, 'post', f'{API}cart/batch/', {'operations': [
+            {'op': 'add', 'product_id': w.product_id(), 'quantity': 1} for _ in range(5)
+        ]}),
+        writes=True,
+    ),
+    Scenario('cart_remove', lambda w: ('delete', w.path, w.headers), prepare=_prepare_remove, writes=True),
+    Scenario('order_place', lambda w: ('post', f'{API}orders/place/', w.headers), prepare=_prepare_order, writes=True),
+    Scenario(
+        'register',
+        lambda w: _json(w, 'post', f'{API}auth/register/', {
+            'username': f'bench_{uuid.uuid4().hex[:12]}',
+            'email': f'{uuid.uuid4().hex[:12]}@example.com',
+            'password': SEED_PASSWORD,
+        }),
+        writes=True,
+    ),
+    Scenario(
+        'product_create',
+        lambda w: ('post', f'{API}products/create/', {'data': {
+            'name': f'Bench product {uuid.uuid4().hex[:8]}', 'price': '19.99', 'description': 'Created by bench_api',
+        }}),
+        writes=True,
+    ),
+    Scenario('product_import', _import_feed, writes=True),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Drive every API endpoint with the Django test client at several '
+        'concurrency levels and report throughput, latency percentiles and '
+        'queries per request. Run seed_data first; write scenarios change the '
+        'database, so point this at a disposable one.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16])
+        parser.add_argument('--requests', type=int, default=200, help='Requests per scenario and concurrency level.')
+        parser.add_argument('--scenarios', nargs='+', default=None, choices=[s.name for s in SCENARIOS])
+        parser.add_argument('--read-only', action='store_true', help='Skip scenarios that write.')
+        parser.add_argument('--prefix', default='seed', help='Username prefix used by seed_data.')
+        parser.add_argument('--output', default=None, help='Write the results as JSON to this file.')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        tokens = list(
+            Token.objects.select_related('user')
+            .filter(user__username__startswith=f"{options['prefix']}_")
+            .order_by('user_id')
+        )
+        staff = [token for token in tokens if token.user.is_staff]
+        product_ids = list(Product.objects.order_by('id').values_list('id', flat=True)[:10000])
+        if not tokens or not staff or not product_ids:
+            raise CommandError('No seeded data found; run "manage.py seed_data" first.')
+
+        scenarios = [
+            scenario for scenario in SCENARIOS
+            if (options['scenarios'] is None or scenario.name in options['scenarios'])
+            and not (options['read_only'] and scenario.writes)
+        ]
+
+        results = []
+        self.stdout.write(
+            f"{'scenario':<22} {'conc':>4} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+            f"{'sql/req':>8} {'errors':>6}"
+        )
+        for concurrency in options['concurrency']:
+            workers = [
+                Worker(
+                    tokens[i % len(tokens)].user, tokens[i % len(tokens)].key, staff[0].key,
+                    product_ids, options['seed'] + i,
+                )
+                for i in range(concurrency)
+            ]
+            for scenario in scenarios:
+                result = self._run(scenario, workers, options['requests'])
+                results.append(result)
+                self.stdout.write(
+                    f"{scenario.name:<22} {concurrency:>4} {result['throughput_rps']:>9.1f} "
+                    f"{result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f} {result['p99_ms']:>8.2f} "
+                    f"{result['queries_per_request']:>8.2f} {result['errors']:>6}"
+                )
+
+        if options['output']:
+            write_results(options['output'], {'meta': run_metadata(), 'results': results})
+            self.stdout.write(f"Results written to {options['output']}")
+
+    def _run(self, scenario, workers, total):
+        samples = []
+        lock = threading.Lock()
+        barrier = threading.Barrier(len(workers))
+        share, extra = divmod(total, len(workers))
+        windows = []
+
+        def work(worker, count):
+            own = []
+            barrier.wait()
+            started = time.perf_counter()
+            try:
+                for _ in range(count):
+                    if scenario.prepare:
+                        scenario.prepare(worker)
+                    method, path, kwargs = scenario.request(worker)
+                    kwargs = dict(kwargs)
+                    counter = QueryCounter()
+                    start = time.perf_counter()
+                    with observe_queries(counter):
+                        response = getattr(worker.client, method)(path, **kwargs)
+                        if response.streaming:
+                            b''.join(response.streaming_content)
+                    own.append((time.perf_counter() - start, counter.count, response.status_code))
+            finally:
+                ended = time.perf_counter()
+                connections.close_all()
+            with lock:
+                samples.extend(own)
+                windows.append((started, ended))
+
+        threads = [
+            threading.Thread(target=work, args=(worker, share + (index < extra)))
+            for index, worker in enumerate(workers)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        elapsed = max(end for _, end in windows) - min(start for start, _ in windows) if windows else 0
+        return {
+            'scenario': scenario.name,
+            'concurrency': len(workers),
+            'requests': len(samples),
+            'errors': sum(1 for _, _, status in samples if status >= 500),
+            'statuses': sorted({status for _, _, status in samples}),
+            'throughput_rps': round(len(samples) / elapsed, 2) if elapsed else 0.0,
+            'queries_per_request': round(sum(queries for _, queries, _ in samples) / len(samples), 2) if samples else 0.0,
+            **latency_summary([latency for latency, _, _ in samples]),
+        }
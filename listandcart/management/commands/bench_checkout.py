@@ -0,0 +1,212 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test import Client
+from django.test.utils import override_settings
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from listandcart.benchmarking import latency_summary, run_metadata, write_results
+from listandcart.cart_summary import rebuild_cart_summaries
+from listandcart.models import Cart, OrderJob, Product
+from listandcart.order_queue import PENDING, drain
+
+from .bench_api import API
+
+MODES = ('inline', 'queued')
+
+
+class DatabaseLoad:
+    """``execute_wrapper`` installed on every connection opened during a
+    burst, recording when statements start and how many run at once."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.starts = []
+        self.connections = set()
+
+    def attach(self, sender, connection, **kwargs):
+        if self not in connection.execute_wrappers:
+            connection.execute_wrappers.append(self)
+
+    def __call__(self, execute, sql, params, many, context):
+        with self.lock:
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            self.starts.append(time.perf_counter())
+            self.connections.add(id(context['connection']))
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+    def summary(self, started, window):
+        """Statements per second in the busiest ``window`` and on average."""
+        counts = {}
+        for start in self.starts:
+            slot = int((start - started) // window)
+            counts[slot] = counts.get(slot, 0) + 1
+        span = (max(counts) + 1) * window if counts else 0
+        return {
+            'statements': len(self.starts),
+            'connections': len(self.connections),
+            'peak_in_flight': self.peak_in_flight,
+            'peak_statements_per_s': round(max(counts.values(), default=0) / window, 1),
+            'mean_statements_per_s': round(len(self.starts) / span, 1) if span else 0.0,
+        }
+
+
+class Command(BaseCommand):
+    help = (
+        'Send bursts of simultaneous checkouts and compare placing orders in the '
+        'request (inline) with queueing them for a worker pool (queued, '
+        'ORDER_CHECKOUT_QUEUE): response latency, time until every order exists '
+        'and how the database load is spread. Run seed_data first; this places '
+        'orders, so point it at a disposable database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modes', nargs='+', default=list(MODES), choices=MODES)
+        parser.add_argument('--bursts', type=int, nargs='+', default=[20, 50], help='Simultaneous checkouts.')
+        parser.add_argument('--rounds', type=int, default=3, help='Bursts per mode and size.')
+        parser.add_argument('--lines', type=int, default=5, help='Cart lines per checkout.')
+        parser.add_argument(
+            '--workers', type=int, default=None, help='Worker threads in queued mode (default: ORDER_WORKER_CONCURRENCY).'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=None, help='Jobs claimed at a time (default: ORDER_WORKER_BATCH_SIZE).'
+        )
+        parser.add_argument('--window', type=float, default=0.1, help='Seconds per database load sample.')
+        parser.add_argument('--prefix', default='seed', help='Username prefix used by seed_data.')
+        parser.add_argument('--output', default=None, help='Write the results as JSON to this file.')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        tokens = list(
+            Token.objects.select_related('user')
+            .filter(user__username__startswith=f"{options['prefix']}_")
+            .order_by('user_id')
+        )
+        product_ids = list(Product.objects.order_by('id').values_list('id', flat=True)[:10000])
+        if not tokens or not product_ids:
+            raise CommandError('No seeded data found; run "manage.py seed_data" first.')
+        if max(options['bursts']) > len(tokens):
+            raise CommandError(f'A burst needs one seeded user per checkout; only {len(tokens)} exist.')
+
+        workers = options['workers'] or getattr(settings, 'ORDER_WORKER_CONCURRENCY', 4)
+        batch_size = options['batch_size'] or getattr(settings, 'ORDER_WORKER_BATCH_SIZE', 50)
+        rng = random.Random(options['seed'])
+
+        results = []
+        self.stdout.write(
+            f"{'mode':<7} {'burst':>5} {'p50 ms':>8} {'p99 ms':>8} {'done s':>7} {'in-flight':>9} "
+            f"{'peak sql/s':>10} {'mean sql/s':>10} {'conns':>5} {'errors':>6}"
+        )
+        for burst in options['bursts']:
+            for mode in options['modes']:
+                for _ in range(options['rounds']):
+                    result = self._burst(
+                        mode, tokens[:burst], product_ids, rng, options['lines'], workers, batch_size, options['window']
+                    )
+                    results.append(result)
+                    self.stdout.write(
+                        f"{mode:<7} {burst:>5} {result['p50_ms']:>8.2f} {result['p99_ms']:>8.2f} "
+                        f"{result['completion_s']:>7.2f} {result['peak_in_flight']:>9} "
+                        f"{result['peak_statements_per_s']:>10.1f} {result['mean_statements_per_s']:>10.1f} "
+                        f"{result['connections']:>5} {result['errors']:>6}"
+                    )
+
+        if options['output']:
+            write_results(options['output'], {'meta': run_metadata(), 'results': results})
+            self.stdout.write(f"Results written to {options['output']}")
+
+    def _fill_carts(self, users, product_ids, rng, lines):
+        Cart.objects.filter(user__in=users).delete()
+        OrderJob.objects.filter(user__in=users, status__in=PENDING).delete()
+        Cart.objects.bulk_create([
+            Cart(user=user, product_id=product_id, quantity=rng.randint(1, 3))
+            for user in users
+            for product_id in rng.sample(product_ids, min(lines, len(product_ids)))
+        ])
+        rebuild_cart_summaries([user.id for user in users])
+
+    def _burst(self, mode, tokens, product_ids, rng, lines, workers, batch_size, window):
+        users = [token.user for token in tokens]
+        self._fill_carts(users, product_ids, rng, lines)
+        connections.close_all()
+
+        queued = mode == 'queued'
+        burst_at = timezone.now()
+        load = DatabaseLoad()
+        samples = []
+        lock = threading.Lock()
+        barrier = threading.Barrier(len(tokens) + 1)
+        stop = threading.Event()
+
+        def checkout(token):
+            client = Client(raise_request_exception=False)
+            barrier.wait()
+            try:
+                start = time.perf_counter()
+                response = client.post(f'{API}orders/place/', HTTP_AUTHORIZATION=f'Token {token.key}')
+                with lock:
+                    samples.append((time.perf_counter() - start, response.status_code))
+            finally:
+                connections.close_all()
+
+        def work():
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='order-worker') as executor:
+                while not stop.is_set():
+                    if not drain(executor, batch_size):
+                        time.sleep(0.05)
+            connections.close_all()
+
+        # The test client always sends Host: testserver.
+        overrides = {'ORDER_CHECKOUT_QUEUE': queued, 'ALLOWED_HOSTS': [*settings.ALLOWED_HOSTS, 'testserver']}
+        connection_created.connect(load.attach)
+        try:
+            with override_settings(**overrides):
+                threads = [threading.Thread(target=checkout, args=(token,)) for token in tokens]
+                if queued:
+                    threads.append(threading.Thread(target=work))
+                for thread in threads:
+                    thread.start()
+                barrier.wait()
+                started = time.perf_counter()
+                for thread in threads[:len(tokens)]:
+                    thread.join()
+                if queued:
+                    while OrderJob.objects.filter(user__in=users, status__in=PENDING).exists():
+                        time.sleep(0.05)
+                completion = time.perf_counter() - started
+                stop.set()
+                for thread in threads[len(tokens):]:
+                    thread.join()
+        finally:
+            connection_created.disconnect(load.attach)
+            connections.close_all()
+
+        # Queued checkouts answer 202 and can still fail in the worker.
+        failed_jobs = OrderJob.objects.filter(
+            user__in=users, status=OrderJob.Status.FAILED, created_at__gte=burst_at
+        ).count()
+        return {
+            'mode': mode,
+            'burst': len(tokens),
+            'workers': workers if queued else None,
+            'requests': len(samples),
+            'errors': sum(1 for _, status in samples if status >= 400) + failed_jobs,
+            'statuses': sorted({status for _, status in samples}),
+            'completion_s': round(completion, 3),
+            **latency_summary([latency for latency, _ in samples]),
+            **load.summary(started, window),
+        }
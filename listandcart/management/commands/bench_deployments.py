@@ -0,0 +1,200 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings
+from rest_framework.authtoken.models import Token
+
+from listandcart.benchmarking import latency_summary, run_metadata, write_results
+
+from .bench_api import API
+
+# How each deployment is reproduced in process: which views are routed and
+# whether requests are driven from threads (a threaded WSGI server) or from
+# tasks on one event loop (an ASGI server).
+Deployment = namedtuple('Deployment', 'name async_views driver')
+
+DEPLOYMENTS = {
+    'wsgi': Deployment('wsgi', False, 'threads'),
+    'asgi': Deployment('asgi', True, 'event-loop'),
+    # Sync views under ASGI: every request hops to a thread, as before the
+    # async views existed.
+    'asgi-sync': Deployment('asgi-sync', False, 'event-loop'),
+}
+
+# ``request(rng, headers)`` returns (path, data, headers) for one GET.
+Scenario = namedtuple('Scenario', 'name request')
+
+SCENARIOS = [
+    Scenario('products', lambda rng, headers: (f'{API}products/', {}, {})),
+    Scenario('products_page', lambda rng, headers: (f'{API}products/', {'limit': 20, 'fields': 'id,name,price'}, {})),
+    Scenario('cart', lambda rng, headers: (f'{API}cart/', {}, headers)),
+    Scenario('order_history', lambda rng, headers: (f'{API}orders/history/', {}, headers)),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare requests per second and tail latency of the WSGI deployment '
+        '(sync views on a thread per in-flight request) with the ASGI deployment '
+        '(async views on one event loop) on the read endpoints at high '
+        'concurrency. Each deployment runs in its own process. Run seed_data first.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--deployments', nargs='+', default=['wsgi', 'asgi'], choices=list(DEPLOYMENTS))
+        parser.add_argument('--concurrency', type=int, nargs='+', default=[16, 64, 256])
+        parser.add_argument('--requests', type=int, default=1000, help='Requests per scenario and concurrency level.')
+        parser.add_argument('--scenarios', nargs='+', default=None, choices=[s.name for s in SCENARIOS])
+        parser.add_argument('--prefix', default='seed', help='Username prefix used by seed_data.')
+        parser.add_argument('--output', default=None, help='Write the results as JSON to this file.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--child', choices=list(DEPLOYMENTS), help=argparse.SUPPRESS)
+
+    def handle(self, *args, **options):
+        if options['child']:
+            results = self._measure(DEPLOYMENTS[options['child']], options)
+            self.stdout.write(json.dumps(results))
+            return
+
+        results = []
+        self.stdout.write(
+            f"{'scenario':<16} {'conc':>5} {'deployment':<10} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} "
+            f"{'p99 ms':>9} {'errors':>6}"
+        )
+        for name in options['deployments']:
+            for result in self._spawn(DEPLOYMENTS[name], options):
+                results.append(result)
+                self.stdout.write(
+                    f"{result['scenario']:<16} {result['concurrency']:>5} {name:<10} "
+                    f"{result['throughput_rps']:>9.1f} {result['p50_ms']:>9.2f} {result['p95_ms']:>9.2f} "
+                    f"{result['p99_ms']:>9.2f} {result['errors']:>6}"
+                )
+
+        if options['output']:
+            write_results(options['output'], {'meta': run_metadata(), 'results': results})
+            self.stdout.write(f"Results written to {options['output']}")
+
+    def _spawn(self, deployment, options):
+        # The URL configuration is fixed at import, so each deployment gets a
+        # fresh interpreter with API_ASYNC_VIEWS set accordingly.
+        command = [
+            sys.executable, os.path.join(settings.BASE_DIR, 'manage.py'), 'bench_deployments',
+            '--child', deployment.name, '--requests', str(options['requests']),
+            '--prefix', options['prefix'], '--seed', str(options['seed']),
+            '--concurrency', *map(str, options['concurrency']),
+        ]
+        if options['scenarios']:
+            command += ['--scenarios', *options['scenarios']]
+        env = {**os.environ, 'API_ASYNC_VIEWS': '1' if deployment.async_views else '0'}
+        completed = subprocess.run(command, env=env, stdout=subprocess.PIPE, text=True)
+        if completed.returncode:
+            raise CommandError(f'The {deployment.name} run failed.')
+        return json.loads(completed.stdout.strip().splitlines()[-1])
+
+    def _measure(self, deployment, options):
+        if settings.API_ASYNC_VIEWS != deployment.async_views:
+            raise CommandError(f'{deployment.name} needs API_ASYNC_VIEWS={int(deployment.async_views)}.')
+        tokens = list(
+            Token.objects.filter(user__username__startswith=f"{options['prefix']}_")
+            .order_by('user_id').values_list('key', flat=True)
+        )
+        if not tokens:
+            raise CommandError('No seeded data found; run "manage.py seed_data" first.')
+
+        scenarios = [s for s in SCENARIOS if options['scenarios'] is None or s.name in options['scenarios']]
+        run = self._run_threads if deployment.driver == 'threads' else self._run_event_loop
+        results = []
+        # The test clients always send Host: testserver, as under the test runner.
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            for concurrency in options['concurrency']:
+                for scenario in scenarios:
+                    shares = [
+                        options['requests'] // concurrency + (index < options['requests'] % concurrency)
+                        for index in range(concurrency)
+                    ]
+                    calls = [
+                        self._calls(scenario, count, tokens[index % len(tokens)], options['seed'] + index)
+                        for index, count in enumerate(shares)
+                    ]
+                    samples, elapsed = run(calls)
+                    results.append(self._summary(deployment, scenario, concurrency, samples, elapsed))
+        connections.close_all()
+        return results
+
+    def _calls(self, scenario, count, token, seed):
+        rng = random.Random(seed)
+        headers = {'Authorization': f'Token {token}'}
+        return [scenario.request(rng, headers) for _ in range(count)]
+
+    def _run_threads(self, calls):
+        samples = []
+        lock = threading.Lock()
+        barrier = threading.Barrier(len(calls) + 1)
+
+        def work(own_calls):
+            client = Client(raise_request_exception=False)
+            own = []
+            barrier.wait()
+            try:
+                for path, data, headers in own_calls:
+                    start = time.perf_counter()
+                    response = client.get(path, data, headers=headers)
+                    if response.streaming:
+                        b''.join(response.streaming_content)
+                    own.append((time.perf_counter() - start, response.status_code))
+            finally:
+                connections.close_all()
+            with lock:
+                samples.extend(own)
+
+        threads = [threading.Thread(target=work, args=(own_calls,)) for own_calls in calls]
+        for thread in threads:
+            thread.start()
+        barrier.wait()
+        started = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        return samples, time.perf_counter() - started
+
+    def _run_event_loop(self, calls):
+        async def work(own_calls, samples):
+            client = AsyncClient(raise_request_exception=False)
+            for path, data, headers in own_calls:
+                start = time.perf_counter()
+                response = await client.get(path, data, headers=headers)
+                if response.streaming:
+                    [chunk async for chunk in response.streaming_content]
+                samples.append((time.perf_counter() - start, response.status_code))
+
+        async def main():
+            samples = []
+            started = time.perf_counter()
+            await asyncio.gather(*(work(own_calls, samples) for own_calls in calls))
+            return samples, time.perf_counter() - started
+
+        return asyncio.run(main())
+
+    def _summary(self, deployment, scenario, concurrency, samples, elapsed):
+        return {
+            'scenario': scenario.name,
+            'deployment': deployment.name,
+            'driver': deployment.driver,
+            'concurrency': concurrency,
+            'requests': len(samples),
+            'errors': sum(1 for _, status in samples if status >= 400),
+            'statuses': sorted({status for _, status in samples}),
+            'throughput_rps': round(len(samples) / elapsed, 2) if elapsed else 0.0,
+            **latency_summary([latency for latency, _ in samples]),
+        }
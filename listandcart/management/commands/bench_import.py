@@ -0,0 +1,55 @@
+import io
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from listandcart.importer import import_products
+from listandcart.models import Product
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure bulk import throughput at several batch sizes against one '
+        'INSERT per product. All writes are rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=20000)
+        parser.add_argument('--batch-sizes', type=int, nargs='+', default=[100, 1000, 5000])
+        parser.add_argument('--single-rows', type=int, default=1000,
+                            help='Rows used for the one-INSERT-per-product baseline.')
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        feed = 'name,price,description\n' + ''.join(
+            f'Product {i},{i % 500}.99,Synthetic product number {i}\n' for i in range(rows)
+        )
+
+        self.stdout.write(f"{'mode':>16} {'rows':>8} {'seconds':>9} {'rows/s':>10}")
+        for batch_size in options['batch_sizes']:
+            elapsed = self._rolled_back(lambda: import_products(io.StringIO(feed), 'csv', batch_size=batch_size))
+            self._report(f'batch {batch_size}', rows, elapsed)
+
+        single = options['single_rows']
+
+        def one_by_one():
+            # create() fires the same save signals (search index, catalog
+            # version) that create_product pays per request.
+            for i in range(single):
+                Product.objects.create(
+                    name=f'Product {i}', price=f'{i % 500}.99', description=f'Synthetic product number {i}'
+                )
+
+        self._report('single INSERT', single, self._rolled_back(one_by_one))
+
+    def _rolled_back(self, run):
+        with transaction.atomic():
+            start = time.perf_counter()
+            run()
+            elapsed = time.perf_counter() - start
+            transaction.set_rollback(True)
+        return elapsed
+
+    def _report(self, mode, rows, elapsed):
+        self.stdout.write(f'{mode:>16} {rows:>8} {elapsed:>9.2f} {rows / elapsed:>10.0f}')
@@ -0,0 +1,60 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from listandcart.models import Product
+from listandcart.search import index_products, search_products
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark indexed product search against a LIKE scan as the catalog '
+        'grows. Synthetic products are created inside a transaction that is '
+        'rolled back at the end.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 50000])
+        parser.add_argument('--queries', type=int, default=50)
+        parser.add_argument('--vocabulary', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        words = [f'w{rng.getrandbits(40):x}' for _ in range(options['vocabulary'])]
+        queries = [rng.choice(words)[:5] for _ in range(options['queries'])]
+
+        self.stdout.write(f"{'products':>10} {'index ms/q':>12} {'scan ms/q':>12}")
+        with transaction.atomic():
+            created = 0
+            for size in sorted(options['sizes']):
+                while created < size:
+                    batch = min(1000, size - created)
+                    products = Product.objects.bulk_create([
+                        Product(
+                            name=' '.join(rng.sample(words, 3)),
+                            price='9.99',
+                            description=' '.join(rng.sample(words, 12)),
+                        )
+                        for _ in range(batch)
+                    ])
+                    if products[0].pk is None:
+                        products = list(Product.objects.order_by('-id')[:batch])
+                    index_products(products)
+                    created += batch
+
+                indexed = self._time(queries, lambda q: search_products(q, 0, 20))
+                scanned = self._time(queries, lambda q: list(
+                    Product.objects.filter(Q(name__icontains=q) | Q(description__icontains=q))
+                ))
+                self.stdout.write(f'{size:>10} {indexed:>12.3f} {scanned:>12.3f}')
+            transaction.set_rollback(True)
+
+    def _time(self, queries, run):
+        start = time.perf_counter()
+        for query in queries:
+            run(query)
+        return (time.perf_counter() - start) * 1000 / len(queries)
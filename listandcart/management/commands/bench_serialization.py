@@ -0,0 +1,86 @@
+import json
+import time
+from decimal import Decimal
+from unittest import mock
+
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+from django.test import RequestFactory
+
+from listandcart import responses
+from listandcart.models import Product
+from listandcart.serializers import MediaURLs, product_data
+
+
+def legacy_product_data(request, product):
+    # What the views did before the serializers module: one
+    # build_absolute_uri() per image field and the stdlib encoder.
+    return {
+        'id': product.id,
+        'name': product.name,
+        'price': str(product.price),
+        'description': product.description,
+        'image': request.build_absolute_uri(product.image.url) if product.image else None,
+        'image_thumb': request.build_absolute_uri(product.image_thumb.url) if product.image_thumb else None,
+        'image_medium': request.build_absolute_uri(product.image_medium.url) if product.image_medium else None,
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare product page serialization: the previous per-field URL '
+        'building with the stdlib encoder against the serializers module '
+        'with the stdlib and orjson encoders. Nothing touches the database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, nargs='+', default=[50, 200, 1000])
+        parser.add_argument('--repeat', type=int, default=50)
+
+    def handle(self, *args, **options):
+        request = RequestFactory().get('/api/products/', HTTP_HOST='localhost')
+
+        def legacy(page):
+            return json.dumps(
+                {'results': [legacy_product_data(request, product) for product in page]}, cls=DjangoJSONEncoder
+            ).encode()
+
+        def current(page):
+            media = MediaURLs(request)
+            return responses.dumps({'results': [product_data(product, media) for product in page]})
+
+        def stdlib(page):
+            with mock.patch.object(responses, 'orjson', None):
+                return current(page)
+
+        modes = [('legacy', legacy), ('stdlib', stdlib)]
+        if responses.orjson is not None:
+            modes.append(('orjson', current))
+        else:
+            self.stdout.write('orjson is not installed; skipping that mode.')
+
+        self.stdout.write(f"{'products':>9} " + ''.join(f'{name + " ms":>12}' for name, _ in modes) + f"{'speedup':>9}")
+        for size in options['products']:
+            page = [
+                Product(
+                    id=i + 1,
+                    name=f'Product {i}',
+                    price=Decimal('10.00') + i,
+                    description='A product description of typical length. ' * 6,
+                    image=f'products/{i}_photo.jpg',
+                    image_thumb=f'products/variants/{i}_thumb.webp',
+                    image_medium=f'products/variants/{i}_medium.webp',
+                )
+                for i in range(size)
+            ]
+            timings = [self._time(run, page, options['repeat']) for _, run in modes]
+            self.stdout.write(
+                f'{size:>9} ' + ''.join(f'{ms:>12.3f}' for ms in timings) + f'{timings[0] / timings[-1]:>8.1f}x'
+            )
+
+    def _time(self, run, page, repeat):
+        run(page)
+        start = time.perf_counter()
+        for _ in range(repeat):
+            run(page)
+        return (time.perf_counter() - start) * 1000 / repeat
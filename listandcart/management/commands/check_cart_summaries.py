@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from listandcart.cart_summary import find_inconsistent_summaries, rebuild_cart_summaries
+
+
+class Command(BaseCommand):
+    help = 'Compare cart summaries with the Cart table and optionally rebuild them.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help='Rebuild the summaries that disagree.')
+        parser.add_argument('--rebuild-all', action='store_true', help='Rebuild every summary from scratch.')
+
+    def handle(self, *args, **options):
+        if options['rebuild_all']:
+            count = rebuild_cart_summaries()
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt summaries for {count} carts.'))
+            return
+
+        mismatches = find_inconsistent_summaries()
+        for user_id, (stored, expected) in sorted(mismatches.items()):
+            self.stdout.write(f'user {user_id}: stored {stored}, expected {expected}')
+
+        if mismatches and options['fix']:
+            rebuild_cart_summaries(list(mismatches))
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt {len(mismatches)} summaries.'))
+        elif not mismatches:
+            self.stdout.write(self.style.SUCCESS('All cart summaries are consistent.'))
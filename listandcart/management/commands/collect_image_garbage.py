@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from listandcart.image_blobs import collect_garbage, readdress_legacy_images, rebuild_image_refs
+
+
+class Command(BaseCommand):
+    help = 'Delete product image files that no product references.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace', type=int, default=None,
+            help='Keep files modified within this many seconds (default: IMAGE_GC_GRACE_SECONDS).'
+        )
+        parser.add_argument('--dry-run', action='store_true', help='List the files without deleting them.')
+        parser.add_argument('--rebuild-refs', action='store_true', help='Recount references from the Product table first.')
+        parser.add_argument(
+            '--readdress-legacy', action='store_true',
+            help='Move images stored under upload names to content-addressed names first.'
+        )
+
+    def handle(self, *args, **options):
+        if options['rebuild_refs']:
+            count = rebuild_image_refs()
+            self.stdout.write(f'Recounted references for {count} files.')
+
+        if options['readdress_legacy'] and not options['dry_run']:
+            moved, missing = readdress_legacy_images()
+            self.stdout.write(f'Moved {moved} legacy images ({missing} missing on disk).')
+
+        removed = collect_garbage(grace=options['grace'], dry_run=options['dry_run'])
+        for name in removed:
+            self.stdout.write(name)
+        verb = 'Would remove' if options['dry_run'] else 'Removed'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {len(removed)} unreferenced files.'))
@@ -0,0 +1,39 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from listandcart.images import generate_variants
+from listandcart.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Render thumbnail and medium WebP variants for product images.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Regenerate variants that already exist.')
+        parser.add_argument('--workers', type=int, default=2)
+
+    def handle(self, *args, **options):
+        products = Product.objects.exclude(image='')
+        if not options['all']:
+            products = products.filter(image_thumb='')
+        product_ids = list(products.values_list('id', flat=True))
+
+        def run(product_id):
+            try:
+                generate_variants(product_id)
+                return None
+            except Exception as e:
+                return f'{product_id}: {e}'
+            finally:
+                close_old_connections()
+
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            errors = [error for error in executor.map(run, product_ids) if error]
+
+        for error in errors:
+            self.stderr.write(error)
+        self.stdout.write(self.style.SUCCESS(
+            f'Processed {len(product_ids) - len(errors)} of {len(product_ids)} products.'
+        ))
@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from listandcart.importer import FORMATS, import_products
+
+
+class Command(BaseCommand):
+    help = 'Import products from a CSV or JSONL file in bulk_create batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=FORMATS, help='Defaults to the file extension.')
+        parser.add_argument('--batch-size', type=int, default=None)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+
+        start = time.perf_counter()
+        try:
+            with open(path, newline='', encoding='utf-8') as source:
+                result = import_products(source, fmt, batch_size=options['batch_size'])
+        except OSError as e:
+            raise CommandError(str(e))
+        elapsed = time.perf_counter() - start
+
+        for error in result.errors:
+            self.stderr.write(f"line {error['line']}: {error['error']}")
+        rate = result.created / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {result.created} products ({result.failed} rejected) '
+            f'in {elapsed:.2f}s, {rate:.0f} rows/s.'
+        ))
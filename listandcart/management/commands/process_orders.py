@@ -0,0 +1,67 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from listandcart.order_queue import drain
+
+
+class Command(BaseCommand):
+    help = (
+        'Place the orders queued by orders/place/ when ORDER_CHECKOUT_QUEUE is on. '
+        'Jobs are claimed in batches and run on a pool of worker threads or processes, '
+        'so the database sees at most one checkout transaction per worker.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--pool', choices=['thread', 'process'], default=None,
+            help='Worker pool type (default: ORDER_WORKER_POOL).'
+        )
+        parser.add_argument('--workers', type=int, default=None, help='Pool size (default: ORDER_WORKER_CONCURRENCY).')
+        parser.add_argument(
+            '--batch-size', type=int, default=None, help='Jobs claimed at a time (default: ORDER_WORKER_BATCH_SIZE).'
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=None,
+            help='Seconds to wait when the queue is empty (default: ORDER_WORKER_POLL_SECONDS).'
+        )
+        parser.add_argument('--once', action='store_true', help='Exit once the queue is empty.')
+
+    def handle(self, *args, **options):
+        pool = options['pool'] or getattr(settings, 'ORDER_WORKER_POOL', 'thread')
+        workers = options['workers'] or getattr(settings, 'ORDER_WORKER_CONCURRENCY', 4)
+        batch_size = options['batch_size'] or getattr(settings, 'ORDER_WORKER_BATCH_SIZE', 50)
+        poll_interval = options['poll_interval'] or getattr(settings, 'ORDER_WORKER_POLL_SECONDS', 1.0)
+
+        if pool == 'process':
+            # Spawned, not forked: processes are started lazily, by which time
+            # this one has a database connection open that forked children
+            # would share. Each child sets Django up and opens its own.
+            executor = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context('spawn'), initializer=django.setup
+            )
+        else:
+            executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='order-worker')
+
+        self.stdout.write(f'Processing queued orders on {workers} worker {pool}s.')
+        total = 0
+        try:
+            with executor:
+                while True:
+                    processed = drain(executor, batch_size)
+                    if processed:
+                        total += processed
+                        self.stdout.write(f'Processed {processed} orders.')
+                    if options['once']:
+                        break
+                    time.sleep(poll_interval)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            connections.close_all()
+        self.stdout.write(self.style.SUCCESS(f'Processed {total} orders in total.'))
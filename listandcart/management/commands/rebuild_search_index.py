@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from listandcart.models import SearchTerm
+from listandcart.revisions import bump_catalog_version
+from listandcart.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the product search index from the Product table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        rebuild_index(batch_size=options['batch_size'])
+        bump_catalog_version()
+        self.stdout.write(self.style.SUCCESS(
+            f'Indexed {SearchTerm.objects.count()} search terms.'
+        ))
@@ -0,0 +1,158 @@
+import random
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from listandcart.cart_summary import rebuild_cart_summaries
+from listandcart.models import Cart, Order, OrderItem, Product
+from listandcart.revisions import bump_catalog_version
+from listandcart.search import index_products
+
+SEED_PASSWORD = 'seed-password'
+
+ADJECTIVES = ['compact', 'wireless', 'smart', 'portable', 'premium', 'classic', 'ultra', 'eco']
+NOUNS = ['speaker', 'headphones', 'television', 'camera', 'kettle', 'lamp', 'keyboard', 'monitor',
+         'router', 'blender', 'watch', 'backpack', 'charger', 'airpods', 'drone', 'printer']
+
+
+def bulk_create_with_ids(model, objects, refetch, batch_size):
+    """``bulk_create`` that also returns ids on backends that cannot report
+    them (MySQL), by re-reading the rows through ``refetch``."""
+    created = model.objects.bulk_create(objects, batch_size=batch_size)
+    if created and created[0].pk is None:
+        created = list(refetch())
+    return created
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate synthetic products, users with tokens, carts and order '
+        'history for load testing. Seeded users log in with the password '
+        f'"{SEED_PASSWORD}".'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=1000)
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--cart-lines', type=int, default=5, help='Cart lines per user.')
+        parser.add_argument('--orders', type=int, default=10, help='Orders per user.')
+        parser.add_argument('--order-lines', type=int, default=3, help='Line items per order.')
+        parser.add_argument('--history-days', type=int, default=90, help='Spread orders over this many past days.')
+        parser.add_argument('--prefix', default='seed', help='Username prefix of the generated users.')
+        parser.add_argument('--staff', type=int, default=1, help='How many of the users are staff.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        batch_size = options['batch_size']
+        prefix = options['prefix']
+
+        with transaction.atomic():
+            first_product_id = (Product.objects.order_by('-id').values_list('id', flat=True).first() or 0)
+            products = bulk_create_with_ids(
+                Product,
+                [
+                    Product(
+                        name=f'{rng.choice(ADJECTIVES).title()} {rng.choice(NOUNS)} {i}',
+                        price=Decimal(rng.randrange(199, 99999)) / 100,
+                        description=' '.join(rng.choice(ADJECTIVES + NOUNS) for _ in range(20)),
+                    )
+                    for i in range(options['products'])
+                ],
+                lambda: Product.objects.filter(id__gt=first_product_id).order_by('id'),
+                batch_size,
+            )
+            index_products(products, batch_size=batch_size)
+
+            password = make_password(SEED_PASSWORD)
+            start = User.objects.filter(username__startswith=f'{prefix}_').count()
+            users = bulk_create_with_ids(
+                User,
+                [
+                    User(
+                        username=f'{prefix}_{i}',
+                        email=f'{prefix}_{i}@example.com',
+                        password=password,
+                        is_staff=i - start < options['staff'],
+                    )
+                    for i in range(start, start + options['users'])
+                ],
+                lambda: User.objects.filter(
+                    username__in=[f'{prefix}_{i}' for i in range(start, start + options['users'])]
+                ),
+                batch_size,
+            )
+            Token.objects.bulk_create(
+                [Token(key=Token.generate_key(), user=user) for user in users],
+                batch_size=batch_size,
+            )
+
+            catalog = products or list(Product.objects.all()[:10000])
+            cart_lines = min(options['cart_lines'], len(catalog))
+            Cart.objects.bulk_create(
+                [
+                    Cart(user=user, product=product, quantity=rng.randint(1, 5))
+                    for user in users
+                    for product in rng.sample(catalog, cart_lines)
+                ],
+                batch_size=batch_size,
+            )
+
+            first_order_id = Order.objects.order_by('-id').values_list('id', flat=True).first() or 0
+            plans = []
+            for user in users:
+                for _ in range(options['orders']):
+                    lines = [
+                        (product, rng.randint(1, 3))
+                        for product in rng.sample(catalog, min(options['order_lines'], len(catalog)))
+                    ]
+                    plans.append((user, lines))
+            orders = bulk_create_with_ids(
+                Order,
+                [
+                    Order(user=user, total_amount=sum(product.price * quantity for product, quantity in lines))
+                    for user, lines in plans
+                ],
+                lambda: Order.objects.filter(id__gt=first_order_id).order_by('id'),
+                batch_size,
+            )
+            OrderItem.objects.bulk_create(
+                [
+                    OrderItem(order=order, product=product, quantity=quantity, price=product.price)
+                    for order, (_, lines) in zip(orders, plans)
+                    for product, quantity in lines
+                ],
+                batch_size=batch_size,
+            )
+            self._backdate(orders, rng, options['history_days'], batch_size)
+
+            rebuild_cart_summaries([user.id for user in users], batch_size=batch_size)
+
+        bump_catalog_version()
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {len(products)} products, {len(users)} users, '
+            f'{len(users) * cart_lines} cart lines and {len(orders)} orders.'
+        ))
+
+    def _backdate(self, orders, rng, days, batch_size):
+        # created_at is auto_now_add, so history is written afterwards with one
+        # UPDATE per (day, chunk) instead of one per order.
+        if days <= 0:
+            return
+        now = timezone.now()
+        by_day = defaultdict(list)
+        for order in orders:
+            by_day[rng.randrange(days)].append(order.id)
+        for day, ids in by_day.items():
+            for start in range(0, len(ids), batch_size):
+                Order.objects.filter(id__in=ids[start:start + batch_size]).update(
+                    created_at=now - timedelta(days=day, seconds=rng.randrange(86400))
+                )
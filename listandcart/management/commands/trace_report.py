@@ -0,0 +1,64 @@
+import glob
+import json
+import re
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+LITERALS_RE = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+IN_LIST_RE = re.compile(r'IN \((?:\s*(?:%s|\?)\s*,?)+\)')
+
+
+def normalize_sql(sql):
+    sql = LITERALS_RE.sub('?', sql)
+    return IN_LIST_RE.sub('IN (...)', sql)
+
+
+class Command(BaseCommand):
+    help = 'Summarize the slowest request traces and the most repeated SQL statements.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', default=None, help='Trace log (rotated backups are read too).')
+        parser.add_argument('--top', type=int, default=10)
+
+    def handle(self, *args, **options):
+        path = options['file'] or settings.TRACE_LOG_FILE
+        traces = []
+        for name in sorted(glob.glob(f'{glob.escape(path)}*')):
+            with open(name, encoding='utf-8') as source:
+                for line in source:
+                    try:
+                        traces.append(json.loads(line))
+                    except ValueError:
+                        continue
+
+        if not traces:
+            self.stdout.write(f'No traces found in {path}')
+            return
+
+        top = options['top']
+        self.stdout.write(f'Slowest {top} of {len(traces)} traces')
+        self.stdout.write(f"{'ms':>10} {'db ms':>9} {'ser ms':>8} {'sql':>5}  request")
+        for trace in sorted(traces, key=lambda trace: trace['duration_ms'], reverse=True)[:top]:
+            self.stdout.write(
+                f"{trace['duration_ms']:>10.1f} {trace['db_ms']:>9.1f} {trace.get('serialize_ms', 0):>8.1f} "
+                f"{len(trace['queries']):>5}  {trace['method']} {trace['path']} ({trace['view']})"
+            )
+
+        statements = defaultdict(lambda: {'count': 0, 'ms': 0.0, 'origins': set()})
+        for trace in traces:
+            for query in trace['queries']:
+                entry = statements[normalize_sql(query['sql'])]
+                entry['count'] += 1
+                entry['ms'] += query['duration_ms']
+                if query.get('origin'):
+                    entry['origins'].add(query['origin'])
+
+        self.stdout.write('')
+        self.stdout.write(f'Most repeated {top} statements')
+        self.stdout.write(f"{'count':>7} {'total ms':>10}  statement")
+        for sql, entry in sorted(statements.items(), key=lambda item: item[1]['count'], reverse=True)[:top]:
+            self.stdout.write(f"{entry['count']:>7} {entry['ms']:>10.1f}  {sql[:160]}")
+            for origin in sorted(entry['origins']):
+                self.stdout.write(f'{"":>19}from {origin}')
@@ -0,0 +1,80 @@
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.utils.http import parse_http_date_safe
+
+HASHED_NAME = re.compile(r'[0-9a-f]{32}(\.[a-z0-9]+)?')
+RANGE = re.compile(r'bytes=(\d*)-(\d*)')
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+
+def is_hashed_name(name):
+    """Whether ``name`` was given by ``ContentAddressedStorage``."""
+    return HASHED_NAME.fullmatch(os.path.basename(name)) is not None
+
+
+def cache_control(name):
+    """Content-hashed files never change; everything else is revalidated."""
+    if is_hashed_name(name):
+        return IMMUTABLE
+    return f"public, max-age={getattr(settings, 'MEDIA_CACHE_MAX_AGE', 3600)}"
+
+
+def file_etag(stat):
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def parse_range(request, size, etag, mtime):
+    """Return the ``(start, end)`` byte span asked for by ``Range``, inclusive.
+
+    None means the whole file: no (or a multi-part) range, or an ``If-Range``
+    that no longer matches. Raises ``ValueError`` for unsatisfiable ranges.
+    """
+    header = request.headers.get('Range')
+    if not header:
+        return None
+    if_range = request.headers.get('If-Range')
+    if if_range:
+        date = parse_http_date_safe(if_range)
+        if if_range != etag and (date is None or int(mtime) > date):
+            return None
+
+    match = RANGE.fullmatch(header.strip())
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError(header)
+    return start, end
+
+
+def offload_headers(name, path):
+    """Headers handing the transfer to the front proxy, or None when
+    ``MEDIA_SENDFILE`` is unset."""
+    mode = getattr(settings, 'MEDIA_SENDFILE', None)
+    if mode == 'x-accel-redirect':
+        prefix = getattr(settings, 'MEDIA_ACCEL_REDIRECT_PREFIX', '/protected-media/')
+        return {'X-Accel-Redirect': prefix.rstrip('/') + '/' + quote(name)}
+    if mode == 'x-sendfile':
+        return {'X-Sendfile': path}
+    return None
+
+
+def iter_range(path, start, length, block_size=64 * 1024):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            block = f.read(min(block_size, length))
+            if not block:
+                break
+            length -= len(block)
+            yield block
@@ -0,0 +1,207 @@
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from functools import partial
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _RouteStats:
+    __slots__ = ('buckets', 'count', 'duration', 'queries', 'db_duration', 'response_bytes', 'statuses')
+
+    def __init__(self, bucket_count):
+        self.buckets = [0] * (bucket_count + 1)
+        self.count = 0
+        self.duration = 0.0
+        self.queries = 0
+        self.db_duration = 0.0
+        self.response_bytes = 0
+        self.statuses = {}
+
+
+class MetricsRegistry:
+    """Per-process request metrics keyed by (route, method)."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.bucket_bounds = tuple(buckets)
+        self._routes = {}
+        self._lock = threading.Lock()
+
+    def record(self, route, method, status, duration, queries, db_duration, response_bytes):
+        bucket = bisect.bisect_left(self.bucket_bounds, duration)
+        status_class = f'{status // 100}xx'
+        with self._lock:
+            stats = self._routes.get((route, method))
+            if stats is None:
+                stats = self._routes[(route, method)] = _RouteStats(len(self.bucket_bounds))
+            stats.buckets[bucket] += 1
+            stats.count += 1
+            stats.duration += duration
+            stats.queries += queries
+            stats.db_duration += db_duration
+            stats.response_bytes += response_bytes
+            stats.statuses[status_class] = stats.statuses.get(status_class, 0) + 1
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+
+    def snapshot(self):
+        with self._lock:
+            return sorted(
+                (route, method, {
+                    'buckets': stats.buckets[:],
+                    'count': stats.count,
+                    'duration': stats.duration,
+                    'queries': stats.queries,
+                    'db_duration': stats.db_duration,
+                    'response_bytes': stats.response_bytes,
+                    'statuses': dict(stats.statuses),
+                })
+                for (route, method), stats in self._routes.items()
+            )
+
+    def render(self):
+        """Return all metrics in the Prometheus text exposition format."""
+        routes = [(_labels(route, method), stats) for route, method, stats in self.snapshot()]
+
+        lines = [
+            '# HELP api_requests_total Requests handled, by route, method and status class.',
+            '# TYPE api_requests_total counter',
+        ]
+        for labels, stats in routes:
+            for status, count in sorted(stats['statuses'].items()):
+                lines.append(f'api_requests_total{{{labels},status="{status}"}} {count}')
+
+        lines += [
+            '# HELP api_request_duration_seconds Time spent producing the response.',
+            '# TYPE api_request_duration_seconds histogram',
+        ]
+        for labels, stats in routes:
+            cumulative = 0
+            for bound, hits in zip(self.bucket_bounds, stats['buckets']):
+                cumulative += hits
+                lines.append(f'api_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'api_request_duration_seconds_bucket{{{labels},le="+Inf"}} {stats["count"]}')
+            lines.append(f'api_request_duration_seconds_sum{{{labels}}} {stats["duration"]:.6f}')
+            lines.append(f'api_request_duration_seconds_count{{{labels}}} {stats["count"]}')
+
+        for name, help_text, field in (
+            ('api_db_queries_total', 'SQL statements executed.', 'queries'),
+            ('api_db_duration_seconds_total', 'Time spent executing SQL.', 'db_duration'),
+            ('api_response_bytes_total', 'Response body bytes (streamed bodies are not counted).', 'response_bytes'),
+        ):
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+            for labels, stats in routes:
+                value = stats[field]
+                lines.append(f'{name}{{{labels}}} {value:.6f}' if isinstance(value, float) else f'{name}{{{labels}}} {value}')
+
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(route, method):
+    route = route.replace('\\', '\\\\').replace('"', '\\"')
+    return f'route="{route}",method="{method}"'
+
+
+registry = MetricsRegistry(getattr(settings, 'METRICS_LATENCY_BUCKETS', DEFAULT_BUCKETS))
+
+
+class QueryCounter:
+    """``execute_wrapper`` callable counting statements and their total time."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+
+
+_observers = contextvars.ContextVar('query_observers', default=())
+
+
+def _dispatch_queries(execute, sql, params, many, context):
+    call = execute
+    for observer in reversed(_observers.get()):
+        call = partial(observer, call)
+    return call(sql, params, many, context)
+
+
+def install_query_dispatch(connection):
+    """Route ``connection``'s statements through the observers of the
+    context that issues them. Done for every connection as it is opened."""
+    if _dispatch_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_dispatch_queries)
+
+
+@contextmanager
+def observe_queries(*wrappers):
+    """Pass every statement issued in this context through ``wrappers``.
+
+    The wrappers are kept in a context variable rather than on a connection:
+    connections belong to a thread, and under ASGI the ORM runs in the
+    ``sync_to_async`` threads, which inherit the caller's context.
+    """
+    for alias in connections:
+        install_query_dispatch(connections[alias])
+    token = _observers.set(_observers.get() + wrappers)
+    try:
+        yield
+    finally:
+        _observers.reset(token)
+
+
+API_VIEW_MODULES = ('listandcart.views', 'listandcart.async_views')
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        counter = QueryCounter()
+        start = time.perf_counter()
+        with observe_queries(counter):
+            response = self.get_response(request)
+        self.record(request, response, counter, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        counter = QueryCounter()
+        start = time.perf_counter()
+        with observe_queries(counter):
+            response = await self.get_response(request)
+        self.record(request, response, counter, time.perf_counter() - start)
+        return response
+
+    def record(self, request, response, counter, duration):
+        match = getattr(request, 'resolver_match', None)
+        if match is not None and match.func.__module__ in API_VIEW_MODULES and match.route:
+            registry.record(
+                route=match.route,
+                method=request.method,
+                status=response.status_code,
+                duration=duration,
+                queries=counter.count,
+                db_duration=counter.duration,
+                response_bytes=0 if response.streaming else len(response.content),
+            )
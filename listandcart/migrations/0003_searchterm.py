@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-16 20:36
+
+import re
+from collections import Counter
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# A frozen copy of listandcart.search.build_terms as of this migration, so
+# later changes to the tokenizer do not change what this migration writes.
+TOKEN_RE = re.compile(r'\w+')
+
+
+def tokenize(text):
+    return [token[:64] for token in TOKEN_RE.findall((text or '').lower()) if len(token) > 1]
+
+
+def build_terms(name, description):
+    weights = Counter()
+    for token in tokenize(name):
+        weights[token] += 3
+    for token in tokenize(description):
+        weights[token] += 1
+    return weights
+
+
+def index_existing_products(apps, schema_editor):
+    Product = apps.get_model('listandcart', 'Product')
+    SearchTerm = apps.get_model('listandcart', 'SearchTerm')
+    rows = [
+        SearchTerm(product_id=product.id, term=term, weight=weight)
+        for product in Product.objects.only('id', 'name', 'description').iterator()
+        for term, weight in build_terms(product.name, product.description).items()
+    ]
+    SearchTerm.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listandcart', '0002_order_user_created_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('weight', models.PositiveIntegerField()),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='listandcart.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['term', 'product'], name='searchterm_term_product_idx')],
+            },
+        ),
+        migrations.RunPython(index_existing_products, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-16 20:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listandcart', '0003_searchterm'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='image_medium',
+            field=models.ImageField(blank=True, upload_to='products/variants/'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='image_thumb',
+            field=models.ImageField(blank=True, upload_to='products/variants/'),
+        ),
+    ]
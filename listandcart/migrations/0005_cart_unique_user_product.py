@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-16 20:40
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def merge_duplicate_lines(apps, schema_editor):
+    # Fold duplicate (user, product) lines into the oldest one so the unique
+    # constraint can be added.
+    Cart = apps.get_model('listandcart', 'Cart')
+    duplicates = (
+        Cart.objects.values('user_id', 'product_id')
+        .annotate(lines=Count('id'), keep_id=Min('id'), quantity=Sum('quantity'))
+        .filter(lines__gt=1)
+    )
+    for line in duplicates:
+        Cart.objects.filter(pk=line['keep_id']).update(quantity=line['quantity'])
+        Cart.objects.filter(
+            user_id=line['user_id'], product_id=line['product_id']
+        ).exclude(pk=line['keep_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listandcart', '0004_product_image_variants'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_lines, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='cart',
+            constraint=models.UniqueConstraint(fields=('user', 'product'), name='cart_unique_user_product'),
+        ),
+    ]
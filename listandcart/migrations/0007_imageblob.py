@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:21
+
+import listandcart.storage
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_image_refs(apps, schema_editor):
+    Product = apps.get_model('listandcart', 'Product')
+    ImageBlob = apps.get_model('listandcart', 'ImageBlob')
+    rows = Product.objects.exclude(image='').values('image').annotate(refs=Count('id')).order_by()
+    ImageBlob.objects.bulk_create([ImageBlob(name=row['image'], ref_count=row['refs']) for row in rows])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listandcart', '0006_cartsummary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageBlob',
+            fields=[
+                ('name', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('ref_count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='image',
+            field=models.ImageField(storage=listandcart.storage.get_image_storage, upload_to='products/'),
+        ),
+        migrations.RunPython(count_image_refs, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:15
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def mark_pending_jobs(apps, schema_editor):
+    # Only the oldest pending job of a user can hold the unique slot; a
+    # duplicate queued before this migration is still processed normally.
+    OrderJob = apps.get_model('listandcart', 'OrderJob')
+    seen = set()
+    for job_id, user_id in (
+        OrderJob.objects.filter(status__in=['queued', 'processing']).order_by('id').values_list('id', 'user_id')
+    ):
+        if user_id not in seen:
+            seen.add(user_id)
+            OrderJob.objects.filter(pk=job_id).update(pending_for_id=user_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listandcart', '0009_revision'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderjob',
+            name='pending_for',
+            field=models.OneToOneField(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='pending_order_job', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(mark_pending_jobs, migrations.RunPython.noop),
+    ]
@@ -1,30 +1,63 @@
+import uuid
+
 from django.db import models
 from django.contrib.auth.models import User
 
+from .storage import get_image_storage
+
 class Product(models.Model):
     name = models.CharField(max_length=255)
     price = models.DecimalField(max_digits=10, decimal_places=2)
     description = models.TextField()
-    image = models.ImageField(upload_to='products/')
+    image = models.ImageField(upload_to='products/', storage=get_image_storage)
+    image_thumb = models.ImageField(upload_to='products/variants/', blank=True)
+    image_medium = models.ImageField(upload_to='products/variants/', blank=True)
 
     def __str__(self):
         return self.name
 
+class ImageBlob(models.Model):
+    """A stored product image file and how many products reference it."""
+    name = models.CharField(max_length=100, primary_key=True)
+    ref_count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name} ({self.ref_count} refs)"
+
+
 class Cart(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     quantity = models.IntegerField(default=1)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'product'], name='cart_unique_user_product'),
+        ]
+
     def __str__(self):
         return f"{self.quantity} of {self.product.name} in {self.user.username}'s cart"
 
 
+class CartSummary(models.Model):
+    user = models.OneToOneField(User, primary_key=True, related_name='cart_summary', on_delete=models.CASCADE)
+    line_count = models.IntegerField(default=0)
+    total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"{self.line_count} lines, {self.total} in {self.user_id}'s cart"
+
 
 class Order(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     total_amount = models.DecimalField(max_digits=10, decimal_places=2)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'created_at'], name='order_user_created_idx'),
+        ]
+
     def __str__(self):
         return f"Order #{self.id} by {self.user.username}"
 
@@ -37,4 +70,69 @@ class OrderItem(models.Model):
     price = models.DecimalField(max_digits=10, decimal_places=2)
 
     def __str__(self):
-        return f"{self.quantity} x {self.product.name} @ {self.price}"
\ No newline at end of file
+        return f"{self.quantity} x {self.product.name} @ {self.price}"
+
+
+class OrderJob(models.Model):
+    """A checkout queued by ``place_order`` for ``manage.py process_orders``.
+
+    ``lines`` is the cart as it was when the order was placed:
+    ``[[product_id, quantity, unit_price], ...]`` with prices as strings.
+    """
+    class Status(models.TextChoices):
+        QUEUED = 'queued'
+        PROCESSING = 'processing'
+        DONE = 'done'
+        FAILED = 'failed'
+
+    ticket = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    # ``user`` while the job is queued or processing, NULL once it is done or
+    # failed: the unique index allows one pending checkout per user on every
+    # backend, including those without partial unique constraints.
+    pending_for = models.OneToOneField(
+        User, null=True, blank=True, editable=False, related_name='pending_order_job', on_delete=models.CASCADE
+    )
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.QUEUED)
+    lines = models.JSONField()
+    total_amount = models.DecimalField(max_digits=10, decimal_places=2)
+    order = models.OneToOneField(Order, null=True, blank=True, related_name='job', on_delete=models.SET_NULL)
+    error = models.CharField(max_length=255, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'id'], name='orderjob_status_idx'),
+            models.Index(fields=['user', 'status'], name='orderjob_user_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"Order job {self.ticket} ({self.status}) for {self.user_id}"
+
+
+
+class SearchTerm(models.Model):
+    term = models.CharField(max_length=64)
+    product = models.ForeignKey(Product, related_name='search_terms', on_delete=models.CASCADE)
+    weight = models.PositiveIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['term', 'product'], name='searchterm_term_product_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.term} -> {self.product_id} ({self.weight})"
+
+
+class Revision(models.Model):
+    """A version stamp behind the conditional-GET ETags: the catalog's, and
+    each user's cart and order history."""
+    key = models.CharField(max_length=64, primary_key=True)
+    value = models.BigIntegerField()
+
+    def __str__(self):
+        return f"{self.key} = {self.value}"
@@ -0,0 +1,190 @@
+import logging
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, close_old_connections, connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .cart_summary import apply_cart_delta
+from .models import Cart, Order, OrderItem, OrderJob, Product
+from .revisions import bump_cart_revision, bump_order_revision
+
+logger = logging.getLogger(__name__)
+
+PENDING = (OrderJob.Status.QUEUED, OrderJob.Status.PROCESSING)
+
+
+def _lease():
+    return timedelta(seconds=getattr(settings, 'ORDER_JOB_LEASE_SECONDS', 300))
+
+
+def _max_attempts():
+    return getattr(settings, 'ORDER_JOB_MAX_ATTEMPTS', 3)
+
+
+def _pending_job(user):
+    return OrderJob.objects.filter(pending_for=user).first()
+
+
+def enqueue_order(user):
+    """Queue a checkout of ``user``'s cart as it is now.
+
+    Returns ``(job, created)``. A user whose previous checkout is still
+    pending gets that job back instead of a second order. Returns
+    ``(None, False)`` for an empty cart. Nothing is locked: two checkouts
+    that both miss the pending job race for the unique ``pending_for`` slot,
+    and the loser returns the winner's job.
+    """
+    job = _pending_job(user)
+    if job is not None:
+        return job, False
+
+    rows = list(
+        Cart.objects.filter(user=user).order_by('id').values_list('product_id', 'quantity', 'product__price')
+    )
+    if not rows:
+        return None, False
+
+    try:
+        with transaction.atomic():
+            job = OrderJob.objects.create(
+                user=user,
+                pending_for=user,
+                lines=[[product_id, quantity, str(price)] for product_id, quantity, price in rows],
+                total_amount=sum(price * quantity for _, quantity, price in rows),
+            )
+    except IntegrityError:
+        return _pending_job(user), False
+    return job, True
+
+
+def claim_jobs(batch_size):
+    """Mark up to ``batch_size`` jobs as processing and return their ids,
+    oldest first.
+
+    Jobs left in processing for longer than ``ORDER_JOB_LEASE_SECONDS`` are
+    taken to belong to a dead worker and are claimed again, until they have
+    been tried ``ORDER_JOB_MAX_ATTEMPTS`` times.
+    """
+    now = timezone.now()
+    stale = Q(status=OrderJob.Status.PROCESSING, claimed_at__lt=now - _lease())
+    with transaction.atomic():
+        OrderJob.objects.filter(stale, attempts__gte=_max_attempts()).update(
+            status=OrderJob.Status.FAILED, pending_for=None, error='The worker did not finish this order',
+            finished_at=now
+        )
+        jobs = OrderJob.objects.filter(Q(status=OrderJob.Status.QUEUED) | stale).order_by('id')
+        if connection.features.has_select_for_update_skip_locked:
+            jobs = jobs.select_for_update(skip_locked=True)
+        ids = list(jobs.values_list('id', flat=True)[:batch_size])
+        if ids:
+            OrderJob.objects.filter(pk__in=ids).update(
+                status=OrderJob.Status.PROCESSING, claimed_at=now, attempts=F('attempts') + 1
+            )
+    return ids
+
+
+def _consume_cart(user_id, lines):
+    """Take the ordered quantities out of the cart. Lines added or raised
+    since the order was placed stay behind."""
+    ordered = {product_id: quantity for product_id, quantity, _ in lines}
+    lock_of = ('self',) if connection.features.has_select_for_update_of else ()
+    items = list(
+        Cart.objects.filter(user_id=user_id, product_id__in=ordered)
+        .select_related('product')
+        .select_for_update(of=lock_of)
+    )
+    removed = {item.pk for item in items if item.quantity <= ordered[item.product_id]}
+    amount = Decimal(0)
+    for item in items:
+        taken = min(item.quantity, ordered[item.product_id])
+        amount += item.product.price * taken
+        if item.pk not in removed:
+            Cart.objects.filter(pk=item.pk).update(quantity=F('quantity') - taken)
+    if removed:
+        Cart.objects.filter(pk__in=removed).delete()
+    if items:
+        apply_cart_delta(user_id, lines=-len(removed), amount=-amount)
+
+
+def process_job(job_id):
+    """Place the order for a claimed job. Returns the job's final status, or
+    None when the job is no longer this worker's to process."""
+    with transaction.atomic():
+        job = OrderJob.objects.select_for_update().filter(pk=job_id, status=OrderJob.Status.PROCESSING).first()
+        if job is None:
+            return None
+
+        product_ids = [product_id for product_id, _, _ in job.lines]
+        if Product.objects.filter(pk__in=product_ids).count() != len(set(product_ids)):
+            job.status = OrderJob.Status.FAILED
+            job.pending_for = None
+            job.error = 'Some products in the cart are no longer available'
+            job.finished_at = timezone.now()
+            job.save(update_fields=['status', 'pending_for', 'error', 'finished_at'])
+            return job.status
+
+        order = Order.objects.create(user_id=job.user_id, total_amount=job.total_amount)
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product_id=product_id, quantity=quantity, price=Decimal(price))
+            for product_id, quantity, price in job.lines
+        ])
+        _consume_cart(job.user_id, job.lines)
+
+        job.status = OrderJob.Status.DONE
+        job.pending_for = None
+        job.order = order
+        job.error = ''
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'pending_for', 'order', 'error', 'finished_at'])
+        # The stamps are database rows, so web processes see the new order
+        # and cart as soon as this commits.
+        bump_cart_revision(job.user_id)
+        bump_order_revision(job.user_id)
+
+    return job.status
+
+
+def run_job(job_id):
+    """``process_job`` for a worker pool: a failed attempt is queued again
+    until ``ORDER_JOB_MAX_ATTEMPTS`` is reached.
+
+    Connections are checked like around a request, so pool threads and
+    processes drop broken or expired ones (all of them with CONN_MAX_AGE=0).
+    """
+    close_old_connections()
+    try:
+        return process_job(job_id)
+    except Exception as e:
+        logger.exception('Could not place the order for job %s', job_id)
+        try:
+            job = OrderJob.objects.filter(pk=job_id).only('attempts').first()
+            if job is None:
+                return None
+            failed = job.attempts >= _max_attempts()
+            if failed:
+                release = {'status': OrderJob.Status.FAILED, 'pending_for': None, 'finished_at': timezone.now()}
+            else:
+                release = {'status': OrderJob.Status.QUEUED, 'finished_at': None}
+            OrderJob.objects.filter(pk=job_id, status=OrderJob.Status.PROCESSING).update(error=str(e)[:255], **release)
+            return release['status']
+        except DatabaseError:
+            # The claim expires after ORDER_JOB_LEASE_SECONDS and is retried then.
+            logger.exception('Could not release job %s', job_id)
+            return None
+    finally:
+        close_old_connections()
+
+
+def drain(executor, batch_size):
+    """Claim batches and run them on ``executor`` until the queue is empty.
+    Returns the number of jobs processed."""
+    processed = 0
+    while True:
+        ids = claim_jobs(batch_size)
+        if not ids:
+            return processed
+        list(executor.map(run_job, ids))
+        processed += len(ids)
@@ -0,0 +1,42 @@
+import base64
+import json
+
+from django.conf import settings
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def page_size_limits():
+    default = getattr(settings, 'API_PAGE_SIZE', 50)
+    maximum = getattr(settings, 'API_MAX_PAGE_SIZE', 200)
+    return default, maximum
+
+
+def parse_limit(request):
+    default, maximum = page_size_limits()
+    raw = request.GET.get('limit')
+    if raw in (None, ''):
+        return default
+    limit = int(raw)
+    if limit < 1:
+        raise ValueError('limit must be a positive integer')
+    return min(limit, maximum)
+
+
+def encode_cursor(*values):
+    raw = json.dumps(list(values), separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, arity):
+    """Return the key tuple packed into ``cursor`` by :func:`encode_cursor`."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise InvalidCursor(cursor)
+    if not isinstance(values, list) or len(values) != arity:
+        raise InvalidCursor(cursor)
+    return values
@@ -0,0 +1,50 @@
+import json
+from decimal import Decimal
+
+from django import http
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .tracing import span
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_django_encoder = DjangoJSONEncoder()
+
+
+def _default(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    return _django_encoder.default(value)
+
+
+def dumps(data):
+    """Serialize ``data`` to JSON bytes, with orjson when it is installed.
+
+    Both paths accept what ``DjangoJSONEncoder`` does and produce the same
+    values: Decimals become strings and datetimes keep Django's format.
+    """
+    if orjson is not None:
+        return orjson.dumps(
+            data, default=_default, option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        )
+    return json.dumps(data, cls=DjangoJSONEncoder, separators=(',', ':')).encode()
+
+
+class JsonResponse(http.JsonResponse):
+    """``JsonResponse`` encoded with ``dumps`` whose encoding time shows up
+    as the trace's ``serialize`` span."""
+
+    def __init__(self, data, encoder=DjangoJSONEncoder, safe=True, json_dumps_params=None, **kwargs):
+        with span('serialize'):
+            if encoder is not DjangoJSONEncoder or json_dumps_params:
+                super().__init__(data, encoder, safe, json_dumps_params, **kwargs)
+                return
+            if safe and not isinstance(data, dict):
+                raise TypeError(
+                    'In order to allow non-dict objects to be serialized set the safe parameter to False.'
+                )
+            kwargs.setdefault('content_type', 'application/json')
+            http.HttpResponse.__init__(self, dumps(data), **kwargs)
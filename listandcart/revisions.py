@@ -0,0 +1,78 @@
+import time
+
+from django.db import connection
+
+from .models import Revision
+
+# Version stamps live in the database rather than the cache: a per-process
+# cache would let one worker keep answering 304 for data another worker
+# changed. Stamps are read through the router like the rows they describe,
+# so a body read from the replica is tagged with the replica's stamp.
+
+CATALOG_VERSION_KEY = 'catalog:version'
+
+
+def _cart_key(user_id):
+    return f'cart:revision:{user_id}'
+
+
+def _orders_key(user_id):
+    return f'orders:revision:{user_id}'
+
+
+def revisions(*keys):
+    """Current stamps of ``keys`` in one query; 0 for keys never bumped."""
+    found = dict(Revision.objects.filter(key__in=keys).values_list('key', 'value'))
+    return tuple(found.get(key, 0) for key in keys)
+
+
+async def arevisions(*keys):
+    found = {key: value async for key, value in Revision.objects.filter(key__in=keys).values_list('key', 'value')}
+    return tuple(found.get(key, 0) for key in keys)
+
+
+def _bump(key):
+    # One upsert, no read: a fresh clock reading differs from the stamp it
+    # replaces, which is all an ETag needs.
+    upsert = {'update_conflicts': True, 'update_fields': ['value']}
+    if connection.features.supports_update_conflicts_with_target:
+        upsert['unique_fields'] = ['key']
+    Revision.objects.bulk_create([Revision(key=key, value=time.time_ns())], **upsert)
+
+
+def catalog_version():
+    return revisions(CATALOG_VERSION_KEY)[0]
+
+
+async def acatalog_version():
+    return (await arevisions(CATALOG_VERSION_KEY))[0]
+
+
+def bump_catalog_version():
+    _bump(CATALOG_VERSION_KEY)
+
+
+def cart_revisions(user_id):
+    """``(cart revision, catalog version)``: a cart body shows catalog data."""
+    return revisions(_cart_key(user_id), CATALOG_VERSION_KEY)
+
+
+async def acart_revisions(user_id):
+    return await arevisions(_cart_key(user_id), CATALOG_VERSION_KEY)
+
+
+def bump_cart_revision(user_id):
+    _bump(_cart_key(user_id))
+
+
+def order_revisions(user_id):
+    """``(order history revision, catalog version)``."""
+    return revisions(_orders_key(user_id), CATALOG_VERSION_KEY)
+
+
+async def aorder_revisions(user_id):
+    return await arevisions(_orders_key(user_id), CATALOG_VERSION_KEY)
+
+
+def bump_order_revision(user_id):
+    _bump(_orders_key(user_id))
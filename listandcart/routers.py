@@ -0,0 +1,234 @@
+import contextvars
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+from .metrics import observe_queries
+
+PIN_COOKIE = 'db_pin'
+
+_read_alias = contextvars.ContextVar('read_alias', default=None)
+
+
+def replica_alias():
+    alias = getattr(settings, 'DATABASE_REPLICA_ALIAS', 'replica')
+    return alias if alias in settings.DATABASES else None
+
+
+def _pin_key(user_id):
+    return f'db:pin:{user_id}'
+
+
+def _pin_seconds():
+    return getattr(settings, 'DATABASE_REPLICA_PIN_SECONDS', 5)
+
+
+def pin_to_primary(request, response):
+    """Send this client's reads to the primary for a short while after it wrote."""
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        cache.set(_pin_key(user.pk), 1, _pin_seconds())
+    response.set_cookie(PIN_COOKIE, '1', max_age=_pin_seconds(), httponly=True, samesite='Lax')
+
+
+async def apin_to_primary(request, response):
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        await cache.aset(_pin_key(user.pk), 1, _pin_seconds())
+    response.set_cookie(PIN_COOKIE, '1', max_age=_pin_seconds(), httponly=True, samesite='Lax')
+
+
+def _is_pinned(request):
+    if request.COOKIES.get(PIN_COOKIE):
+        return True
+    user = getattr(request, 'user', None)
+    return user is not None and user.is_authenticated and cache.get(_pin_key(user.pk)) is not None
+
+
+async def _ais_pinned(request):
+    if request.COOKIES.get(PIN_COOKIE):
+        return True
+    user = getattr(request, 'user', None)
+    return user is not None and user.is_authenticated and await cache.aget(_pin_key(user.pk)) is not None
+
+
+# alias -> (reachable, monotonic time of the next check)
+_replica_health = {}
+
+
+def _retry_at():
+    return time.monotonic() + getattr(settings, 'DATABASE_REPLICA_RETRY_SECONDS', 30)
+
+
+def _probe_replica(alias):
+    try:
+        connections[alias].ensure_connection()
+        available = True
+    except DatabaseError:
+        available = False
+    _replica_health[alias] = (available, _retry_at())
+    return available
+
+
+def _cached_health(alias):
+    available, next_check = _replica_health.get(alias, (None, 0.0))
+    return available if time.monotonic() < next_check else None
+
+
+def _replica_available(alias):
+    """Whether the replica answered its last connection check. The answer,
+    either way, is kept for ``DATABASE_REPLICA_RETRY_SECONDS``, so requests
+    in between do not open a connection just to look."""
+    available = _cached_health(alias)
+    return _probe_replica(alias) if available is None else available
+
+
+async def _areplica_available(alias):
+    available = _cached_health(alias)
+    return await sync_to_async(_probe_replica)(alias) if available is None else available
+
+
+class ReplicaErrors:
+    """``execute_wrapper`` noting whether a statement failed on ``alias``."""
+
+    def __init__(self, alias):
+        self.alias = alias
+        self.failed = False
+
+    def __call__(self, execute, sql, params, many, context):
+        try:
+            return execute(sql, params, many, context)
+        except DatabaseError:
+            if context['connection'].alias == self.alias:
+                self.failed = True
+            raise
+
+
+def _fall_back(alias):
+    # The replica broke mid-request, after its last check passed: keep the
+    # next requests off it for the retry window and answer this one again
+    # from the primary. Only GET and HEAD are routed, so running the view
+    # twice is safe.
+    _replica_health[alias] = (False, _retry_at())
+
+
+def replica_reads(view):
+    """Route the view's ORM reads to the replica when one is configured, the
+    client has not written recently and the replica is reachable.
+
+    A replica query that fails, whether the view lets the error through or
+    turns it into a response, sends the request back to the primary.
+    """
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            alias = replica_alias()
+            if (
+                alias is None
+                or request.method not in ('GET', 'HEAD')
+                or await _ais_pinned(request)
+                or not await _areplica_available(alias)
+            ):
+                return await view(request, *args, **kwargs)
+
+            errors = ReplicaErrors(alias)
+            token = _read_alias.set(alias)
+            try:
+                with observe_queries(errors):
+                    response = await view(request, *args, **kwargs)
+            except DatabaseError:
+                # Opening the connection fails before any statement runs.
+                if not errors.failed and await sync_to_async(_probe_replica)(alias):
+                    raise
+                errors.failed = True
+            finally:
+                _read_alias.reset(token)
+
+            if not errors.failed:
+                return response
+            _fall_back(alias)
+            return await view(request, *args, **kwargs)
+
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        alias = replica_alias()
+        if (
+            alias is None
+            or request.method not in ('GET', 'HEAD')
+            or _is_pinned(request)
+            or not _replica_available(alias)
+        ):
+            return view(request, *args, **kwargs)
+
+        errors = ReplicaErrors(alias)
+        token = _read_alias.set(alias)
+        try:
+            with observe_queries(errors):
+                response = view(request, *args, **kwargs)
+        except DatabaseError:
+            # Opening the connection fails before any statement runs.
+            if not errors.failed and _probe_replica(alias):
+                raise
+            errors.failed = True
+        finally:
+            _read_alias.reset(token)
+
+        if not errors.failed:
+            return response
+        _fall_back(alias)
+        return view(request, *args, **kwargs)
+
+    return wrapper
+
+
+class PrimaryReplicaRouter:
+    """Reads go to the replica only inside views marked with ``replica_reads``;
+    everything else, and every write, uses the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+
+def _should_pin(request, response):
+    return (
+        replica_alias() is not None
+        and request.method not in ('GET', 'HEAD', 'OPTIONS')
+        and response.status_code < 400
+    )
+
+
+class ReadYourWritesMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.get_response(request)
+        if _should_pin(request, response):
+            pin_to_primary(request, response)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        if _should_pin(request, response):
+            await apin_to_primary(request, response)
+        return response
@@ -0,0 +1,105 @@
+import re
+from collections import Counter
+from functools import reduce
+from operator import add, or_
+
+from django.db import transaction
+from django.db.models import Case, Max, Q, Sum, Value, When
+
+from .models import Product, SearchTerm
+
+TOKEN_RE = re.compile(r'\w+')
+MAX_TERM_LENGTH = 64
+MAX_QUERY_TERMS = 8
+NAME_WEIGHT = 3
+DESCRIPTION_WEIGHT = 1
+
+
+def tokenize(text):
+    return [
+        token[:MAX_TERM_LENGTH]
+        for token in TOKEN_RE.findall((text or '').lower())
+        if len(token) > 1
+    ]
+
+
+def build_terms(name, description):
+    weights = Counter()
+    for token in tokenize(name):
+        weights[token] += NAME_WEIGHT
+    for token in tokenize(description):
+        weights[token] += DESCRIPTION_WEIGHT
+    return weights
+
+
+def index_products(products, batch_size=1000):
+    """Replace the index rows of ``products`` with freshly tokenized ones."""
+    products = [product for product in products if product.pk is not None]
+    if not products:
+        return
+    rows = [
+        SearchTerm(product_id=product.pk, term=term, weight=weight)
+        for product in products
+        for term, weight in build_terms(product.name, product.description).items()
+    ]
+    with transaction.atomic():
+        SearchTerm.objects.filter(product_id__in=[product.pk for product in products]).delete()
+        SearchTerm.objects.bulk_create(rows, batch_size=batch_size)
+
+
+def rebuild_index(batch_size=1000):
+    SearchTerm.objects.all().delete()
+    last_id = 0
+    while True:
+        batch = list(
+            Product.objects.filter(id__gt=last_id)
+            .order_by('id')
+            .only('id', 'name', 'description')[:batch_size]
+        )
+        if not batch:
+            break
+        index_products(batch, batch_size=batch_size)
+        last_id = batch[-1].id
+
+
+def _prefix_match(term):
+    # LIKE 'term%' rather than a computed upper bound: the next character
+    # after the last one only bounds the prefix under a binary collation,
+    # while MySQL's default collation sorts punctuation before letters and
+    # digits ('jazz' < 'jaz{' does not hold). MySQL answers a constant
+    # prefix LIKE with a range scan on the (term, product) index.
+    return Q(term__startswith=term)
+
+
+def search_products(query, offset, limit):
+    """Return ``(products, has_more)`` for products matching every term of
+    ``query`` by prefix, best matches first.
+    """
+    terms = list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+    if not terms:
+        return [], False
+
+    matches = [_prefix_match(term) for term in terms]
+    matched = reduce(add, [
+        Max(Case(When(term_match, then=Value(1)), default=Value(0)))
+        for term_match in matches
+    ])
+    ranked = list(
+        SearchTerm.objects.filter(reduce(or_, matches))
+        .values('product_id')
+        .annotate(score=Sum('weight'), matched=matched)
+        .filter(matched=len(terms))
+        .order_by('-score', 'product_id')
+        .values_list('product_id', 'score')[offset:offset + limit + 1]
+    )
+
+    has_more = len(ranked) > limit
+    ranked = ranked[:limit]
+    products = Product.objects.in_bulk([product_id for product_id, _ in ranked])
+    results = []
+    for product_id, score in ranked:
+        product = products.get(product_id)
+        if product is not None:
+            product.score = score
+            results.append(product)
+    return results, has_more
@@ -0,0 +1,128 @@
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.utils.encoding import filepath_to_uri
+
+from .models import Product
+
+PRODUCT_IMAGE_FIELDS = ('image', 'image_thumb', 'image_medium')
+
+
+class MediaURLs:
+    """Turn stored file names into absolute URLs.
+
+    The base URL is resolved once: from ``MEDIA_CDN_URL`` when it is set,
+    otherwise from the request's scheme and host. Storages that do not serve
+    files from a fixed prefix fall back to ``storage.url()`` per file.
+    """
+
+    def __init__(self, request):
+        self.request = request
+        self.storage = Product._meta.get_field('image').storage
+        cdn = getattr(settings, 'MEDIA_CDN_URL', None)
+        if cdn:
+            self.base = cdn.rstrip('/') + '/'
+        elif isinstance(self.storage, FileSystemStorage):
+            self.base = request.build_absolute_uri(self.storage.base_url)
+        else:
+            self.base = None
+
+    def __call__(self, name):
+        if not name:
+            return None
+        if self.base is not None:
+            return self.base + filepath_to_uri(str(name)).lstrip('/')
+        return self.request.build_absolute_uri(self.storage.url(str(name)))
+
+
+def media_urls(request):
+    """The request's ``MediaURLs``, built on first use."""
+    urls = getattr(request, '_media_urls', None)
+    if urls is None:
+        urls = request._media_urls = MediaURLs(request)
+    return urls
+
+
+def parse_fields(request, available):
+    """Return the ``?fields=`` selection in ``available`` order.
+
+    Every field is returned when the parameter is absent. Raises
+    ``ValueError`` for names outside ``available`` or an empty selection.
+    """
+    raw = request.GET.get('fields')
+    if raw is None:
+        return tuple(available)
+    requested = {name.strip() for name in raw.split(',') if name.strip()}
+    unknown = requested.difference(available)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    if not requested:
+        raise ValueError('fields must name at least one field')
+    return tuple(name for name in available if name in requested)
+
+
+# Response fields are named after the model fields they read, so a selection
+# can be passed straight to ``.only()``.
+PRODUCT_FIELDS = ('id', 'name', 'price', 'description') + PRODUCT_IMAGE_FIELDS
+
+# Response field -> key of the ``.values()`` row built by ``_cart_payload``.
+CART_LINE_FIELDS = {
+    'id': 'id',
+    'product_id': 'product_id',
+    'product_name': 'product__name',
+    'price': 'product__price',
+    'quantity': 'quantity',
+    'item_total': 'item_total',
+    'image': 'product__image',
+}
+
+# Response field -> ``Order`` column; ``items`` comes from the prefetch.
+ORDER_FIELDS = {
+    'order_id': 'id',
+    'total_amount': 'total_amount',
+    'created_at': 'created_at',
+    'items': None,
+}
+
+
+def product_data(product, media, fields=PRODUCT_FIELDS):
+    data = {name: getattr(product, name) for name in fields}
+    if 'price' in data:
+        data['price'] = str(data['price'])
+    for name in PRODUCT_IMAGE_FIELDS:
+        if name in data:
+            data[name] = media(data[name].name)
+    return data
+
+
+def cart_line_data(row, media, fields=tuple(CART_LINE_FIELDS)):
+    """Serialize a ``Cart`` row read with ``.values()`` as in ``_cart_payload``."""
+    data = {name: row[CART_LINE_FIELDS[name]] for name in fields}
+    for name in ('price', 'item_total'):
+        if name in data:
+            data[name] = str(data[name])
+    if 'image' in data:
+        data['image'] = media(data['image'])
+    return data
+
+
+def order_item_data(item):
+    return {
+        'product_id': item.product_id,
+        'product_name': item.product.name,
+        'quantity': item.quantity,
+        'price': str(item.price),
+        'item_total': str(item.price * item.quantity),
+    }
+
+
+def order_data(order, fields=tuple(ORDER_FIELDS)):
+    data = {}
+    if 'order_id' in fields:
+        data['order_id'] = order.id
+    if 'total_amount' in fields:
+        data['total_amount'] = str(order.total_amount)
+    if 'created_at' in fields:
+        data['created_at'] = order.created_at.strftime('%Y-%m-%d %H:%M:%S')
+    if 'items' in fields:
+        data['items'] = [order_item_data(item) for item in order.items.all()]
+    return data
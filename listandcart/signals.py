@@ -0,0 +1,89 @@
+from django.contrib.auth.models import User
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import token_cache
+from .cart_summary import rebuild_cart_summaries
+from .image_blobs import apply_image_refs
+from .metrics import install_query_dispatch
+from .models import Cart, Product
+from .revisions import bump_catalog_version
+from .search import index_products
+
+
+@receiver(connection_created)
+def observe_connection(sender, connection, **kwargs):
+    install_query_dispatch(connection)
+
+
+@receiver(post_save, sender=Token)
+@receiver(post_delete, sender=Token)
+def invalidate_token(sender, instance, **kwargs):
+    token_cache.discard(instance.key)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_tokens(sender, instance, **kwargs):
+    token_cache.discard_user(instance.pk)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_catalog(sender, instance, **kwargs):
+    bump_catalog_version()
+
+
+@receiver(post_save, sender=Product)
+def reindex_product(sender, instance, raw=False, **kwargs):
+    if not raw:
+        index_products([instance])
+
+
+@receiver(post_save, sender=Product)
+def refresh_cart_summaries(sender, instance, created, raw=False, **kwargs):
+    # Summaries hold totals at the price the lines were added at; a product
+    # edit may change the price, so re-derive the carts that contain it.
+    if created or raw:
+        return
+    user_ids = list(Cart.objects.filter(product=instance).values_list('user_id', flat=True))
+    if user_ids:
+        rebuild_cart_summaries(user_ids)
+
+
+@receiver(pre_delete, sender=Product)
+def remember_cart_owners(sender, instance, **kwargs):
+    instance._cart_user_ids = list(Cart.objects.filter(product=instance).values_list('user_id', flat=True))
+
+
+@receiver(post_delete, sender=Product)
+def refresh_cart_summaries_after_delete(sender, instance, **kwargs):
+    user_ids = getattr(instance, '_cart_user_ids', None)
+    if user_ids:
+        rebuild_cart_summaries(user_ids)
+
+
+@receiver(pre_save, sender=Product)
+def remember_stored_image(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and 'image' not in update_fields):
+        return
+    if instance._state.adding:
+        instance._stored_image = ''
+    else:
+        instance._stored_image = Product.objects.filter(pk=instance.pk).values_list('image', flat=True).first() or ''
+
+
+@receiver(post_save, sender=Product)
+def count_image_refs(sender, instance, raw=False, **kwargs):
+    stored = instance.__dict__.pop('_stored_image', None)
+    if raw or stored is None:
+        return
+    if stored != instance.image.name:
+        apply_image_refs(removed=stored, added=instance.image.name)
+
+
+@receiver(post_delete, sender=Product)
+def release_image_ref(sender, instance, **kwargs):
+    apply_image_refs(removed=instance.image.name)
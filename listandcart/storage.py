@@ -0,0 +1,72 @@
+import hashlib
+import os
+import posixpath
+import re
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+def content_name(directory, digest, original_name):
+    """``<directory>/<32 hex digits><ext>``, keeping a sane lowercase extension."""
+    ext = os.path.splitext(original_name)[1].lower()
+    if not re.fullmatch(r'\.[a-z0-9]{1,8}', ext):
+        ext = ''
+    return posixpath.join(directory, f'{digest[:32]}{ext}')
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """File system storage that keeps each distinct file once, named after
+    the SHA-256 of its content.
+
+    ``save()`` streams the upload into a temporary file next to its target
+    while hashing it. When a file with that digest exists the copy is dropped
+    and the existing name returned, so identical uploads share one file.
+    Unreferenced files are removed by ``manage.py collect_image_garbage``.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # The final name comes from the content in _save(); a clash there is
+        # the same file, not a conflict to rename around.
+        return name
+
+    def _save(self, name, content):
+        directory = posixpath.dirname(name)
+        target_dir = self.path(directory)
+        os.makedirs(target_dir, exist_ok=True)
+
+        digest = hashlib.sha256()
+        fd, temp_path = tempfile.mkstemp(dir=target_dir, prefix='.upload-')
+        try:
+            with os.fdopen(fd, 'wb') as temp:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    temp.write(chunk)
+            final_name = content_name(directory, digest.hexdigest(), name)
+            final_path = self.path(final_name)
+            if os.path.exists(final_path):
+                # A fresh mtime keeps the garbage collector's grace period
+                # covering the reference about to be recorded.
+                os.utime(final_path)
+                os.remove(temp_path)
+            else:
+                os.chmod(temp_path, self.file_permissions_mode or 0o644)
+                os.replace(temp_path, final_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return final_name
+
+
+_image_storage = None
+
+
+def get_image_storage():
+    """Storage for ``Product.image``."""
+    global _image_storage
+    if _image_storage is None:
+        _image_storage = ContentAddressedStorage()
+    return _image_storage
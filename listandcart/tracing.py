@@ -0,0 +1,218 @@
+import asyncio
+import atexit
+import contextvars
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from .metrics import observe_queries
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+# Statements pass through these on their way to the database; they are never
+# where a query comes from.
+_PLUMBING = {os.path.join(APP_DIR, 'metrics.py'), os.path.join(APP_DIR, 'tracing.py')}
+
+_current = contextvars.ContextVar('trace', default=None)
+
+
+class Trace:
+    def __init__(self, task=None):
+        self.queries = []
+        self.spans = []
+        # The request's asyncio task under ASGI, whose suspended coroutines
+        # hold the app frames of queries run in sync_to_async threads.
+        self.task = task
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            # Parameters are left out on purpose: they carry tokens and
+            # personal data, and the bare statement is what gets grouped.
+            self.queries.append({
+                'sql': sql,
+                'duration_ms': round((time.perf_counter() - start) * 1000, 3),
+                'origin': _view_origin(self.task),
+            })
+
+
+def _is_app_frame(frame):
+    filename = frame.f_code.co_filename
+    return filename.startswith(APP_DIR + os.sep) and filename not in _PLUMBING
+
+
+def _describe(frame):
+    return f'{os.path.relpath(frame.f_code.co_filename, APP_DIR)}:{frame.f_lineno} in {frame.f_code.co_name}'
+
+
+def _awaiting_frames(task):
+    """Frames of the coroutines ``task`` is suspended in, outermost first."""
+    frames = []
+    awaitable = task.get_coro()
+    while awaitable is not None:
+        frame = getattr(awaitable, 'cr_frame', None) or getattr(awaitable, 'ag_frame', None)
+        if frame is not None:
+            frames.append(frame)
+        awaitable = getattr(awaitable, 'cr_await', None) or getattr(awaitable, 'ag_await', None)
+    return frames
+
+
+def _view_origin(task=None):
+    """The innermost app frame that issued the current statement."""
+    frame = sys._getframe(1)
+    while frame is not None:
+        if _is_app_frame(frame):
+            return _describe(frame)
+        frame = frame.f_back
+    if task is not None:
+        for frame in reversed(_awaiting_frames(task)):
+            if _is_app_frame(frame):
+                return _describe(frame)
+    return None
+
+
+@contextmanager
+def span(name):
+    """Time a block as a named span of the current trace, if any."""
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.spans.append({'name': name, 'duration_ms': round((time.perf_counter() - start) * 1000, 3)})
+
+
+class _DroppingQueueHandler(QueueHandler):
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass
+
+    def prepare(self, record):
+        return record
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def _get_writer():
+    """Start the background writer thread on first use."""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            path = getattr(settings, 'TRACE_LOG_FILE', os.path.join(settings.BASE_DIR, 'logs', 'traces.jsonl'))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            file_handler = RotatingFileHandler(
+                path,
+                maxBytes=getattr(settings, 'TRACE_LOG_MAX_BYTES', 10 * 1024 * 1024),
+                backupCount=getattr(settings, 'TRACE_LOG_BACKUP_COUNT', 5),
+                encoding='utf-8',
+            )
+            file_handler.setFormatter(logging.Formatter('%(message)s'))
+            records = queue.Queue(maxsize=getattr(settings, 'TRACE_QUEUE_SIZE', 10000))
+            listener = QueueListener(records, file_handler)
+            listener.start()
+            atexit.register(listener.stop)
+
+            logger = logging.getLogger('listandcart.traces')
+            logger.propagate = False
+            logger.setLevel(logging.INFO)
+            logger.addHandler(_DroppingQueueHandler(records))
+            _writer = logger
+        return _writer
+
+
+def write_trace(record):
+    _get_writer().info(json.dumps(record, default=str))
+
+
+class TracingMiddleware:
+    """Capture full traces for a sample of requests.
+
+    A request is traced when it is picked at ``TRACE_SAMPLE_RATE`` or when it
+    takes at least ``TRACE_SLOW_MS``. With a slow threshold set, every
+    request is recorded in memory and only slow ones are written.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def _sample(self):
+        rate = getattr(settings, 'TRACE_SAMPLE_RATE', 0.0)
+        slow_ms = getattr(settings, 'TRACE_SLOW_MS', None)
+        sampled = rate > 0 and random.random() < rate
+        return sampled, slow_ms, sampled or slow_ms is not None
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        sampled, slow_ms, traced = self._sample()
+        if not traced:
+            return self.get_response(request)
+
+        trace = Trace()
+        token = _current.set(trace)
+        start = time.perf_counter()
+        try:
+            with observe_queries(trace):
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.finish(request, response, trace, (time.perf_counter() - start) * 1000, sampled, slow_ms)
+        return response
+
+    async def __acall__(self, request):
+        sampled, slow_ms, traced = self._sample()
+        if not traced:
+            return await self.get_response(request)
+
+        trace = Trace(asyncio.current_task())
+        token = _current.set(trace)
+        start = time.perf_counter()
+        try:
+            with observe_queries(trace):
+                response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.finish(request, response, trace, (time.perf_counter() - start) * 1000, sampled, slow_ms)
+        return response
+
+    def finish(self, request, response, trace, duration_ms, sampled, slow_ms):
+        if sampled or duration_ms >= slow_ms:
+            match = getattr(request, 'resolver_match', None)
+            write_trace({
+                'timestamp': time.time(),
+                'view': match.view_name if match else None,
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'reason': 'sampled' if sampled else 'slow',
+                'duration_ms': round(duration_ms, 3),
+                'db_ms': round(sum(query['duration_ms'] for query in trace.queries), 3),
+                'serialize_ms': round(sum(
+                    item['duration_ms'] for item in trace.spans if item['name'] == 'serialize'
+                ), 3),
+                'spans': trace.spans,
+                'queries': trace.queries,
+            })
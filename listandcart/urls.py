@@ -1,16 +1,27 @@
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path
-from listandcart import views
+from listandcart import async_views, views
+
+# The ASGI deployment (API_ASYNC_VIEWS) routes the read paths to their native
+# async versions, which share queries and serialization with the sync views.
+reads = async_views if getattr(settings, 'API_ASYNC_VIEWS', False) else views
 
 urlpatterns = [
     path('auth/register/', views.register_user),
     path('auth/login/', views.login_user),
-    path('products/', views.product_list),
+    path('products/', reads.product_list),
+    path('products/search/', views.product_search),
+    path('products/import/', views.bulk_import_products),
     path('products/create/', views.create_product, name='create_product'),
     path('cart/add/', views.add_to_cart, name='add_to_cart'),
-    path('cart/', views.view_cart),
+    path('cart/', reads.view_cart),
+    path('cart/batch/', views.batch_update_cart),
+    path('cart/summary/', views.cart_summary),
     path('cart/remove/<int:item_id>/', views.remove_from_cart),
     path('cart/update/<int:product_id>/', views.update_cart_item,name = 'update_cart_item'),
     path('orders/place/', views.place_order),
-    path('orders/history/', views.order_history),
+    path('orders/status/<uuid:ticket>/', views.order_status, name='order_status'),
+    path('orders/history/', reads.order_history),
+    path('metrics', views.metrics),
 ]
\ No newline at end of file
@@ -1,13 +1,45 @@
 from django.shortcuts import get_object_or_404
-from django.http import JsonResponse
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.csrf import csrf_exempt
-from .models import Product, Cart, Order, OrderItem
+from django.views.decorators.http import etag
+from .models import Product, Cart, CartSummary, Order, OrderItem, OrderJob
+from .authentication import resolve_token, token_required
+from .cart_summary import apply_cart_delta, rebuild_cart_summaries
+from .catalog_cache import cached_catalog_page
+from .compression import encoded_response, negotiate_encoding
+from .images import schedule_variants
+from .importer import FORMATS, import_products
+from .media import cache_control, file_etag, iter_range, offload_headers, parse_range
+from .metrics import registry as metrics_registry
+from .order_queue import enqueue_order
+from .responses import JsonResponse, dumps
+from .pagination import InvalidCursor, decode_cursor, encode_cursor, parse_limit
+from .routers import replica_reads
+from .search import search_products
+from .serializers import (
+    CART_LINE_FIELDS, ORDER_FIELDS, PRODUCT_FIELDS,
+    cart_line_data, media_urls, order_data, parse_fields, product_data
+)
+from .tracing import span
+from .revisions import (
+    bump_cart_revision, bump_order_revision, cart_revisions, catalog_version, order_revisions
+)
+import hashlib
 import json
-from django.core.files.storage import default_storage
-from django.core.files.base import ContentFile
-from datetime import datetime
-from django.db import transaction
+import mimetypes
+import os
+import stat
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from decimal import Decimal
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Prefetch, Q, Sum, Window
+from django.urls import reverse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.dateparse import parse_datetime
+from django.utils.http import http_date
 
 from rest_framework.authtoken.models import Token
 from django.contrib.auth.models import User
@@ -33,27 +65,23 @@ def create_product(request):
 
                 product = Product(
                     name=name,
-                    price=float(price),
+                    price=Decimal(price).quantize(CENTS),
                     description=description
                 )
 
                
                 if image_file:
-                    file_name = default_storage.save(
-                        f'products/{datetime.now().timestamp()}_{image_file.name}',
-                        ContentFile(image_file.read())
-                    )
-                    product.image = file_name
+                    # The image storage hashes the upload while copying it
+                    # chunk by chunk and names it after the digest, so
+                    # identical uploads share one file that can be cached as
+                    # immutable.
+                    product.image.save(image_file.name, image_file, save=False)
 
                 product.save()
+                if product.image:
+                    schedule_variants(product.id)
 
-                return JsonResponse({
-                    'id': product.id,
-                    'name': product.name,
-                    'price': str(product.price),
-                    'description': product.description,
-                    'image': request.build_absolute_uri(product.image.url) if product.image else None,
-                }, status=201)
+                return JsonResponse(product_data(product, media_urls(request)), status=201)
 
            
             elif request.content_type == 'application/json':
@@ -69,18 +97,11 @@ def create_product(request):
                 
                 product = Product.objects.create(
                     name=data['name'],
-                    price=float(data['price']),
+                    price=Decimal(str(data['price'])).quantize(CENTS),
                     description=data['description']
                 )
 
-                return JsonResponse({
-                    'id': product.id,
-                    'name': product.name,
-                    'price': str(product.price),
-                    'description': product.description,
-                    'image': None,
-                    'created_at': product.created_at.strftime('%Y-%m-%d %H:%M:%S')
-                }, status=201)
+                return JsonResponse(product_data(product, media_urls(request)), status=201)
 
             else:
                 return JsonResponse(
@@ -99,37 +120,275 @@ def create_product(request):
         status=405
     )
 
+def _etag(*parts):
+    return hashlib.sha1('|'.join(str(part) for part in parts).encode()).hexdigest()
+
+
+def _catalog_version(request):
+    # Read once per request: for the ETag and again for the page cache key.
+    if not hasattr(request, '_catalog_version'):
+        request._catalog_version = catalog_version()
+    return request._catalog_version
+
+
+def _catalog_etag(request):
+    return _etag('catalog', _catalog_version(request), request.get_host(), request.get_full_path())
+
+
+def _cart_etag(request):
+    return _etag(
+        'cart', request.user.id, *cart_revisions(request.user.id),
+        request.get_host(), request.get_full_path()
+    )
+
+
+def _order_history_etag(request):
+    return _etag(
+        'orders', request.user.id, *order_revisions(request.user.id), request.get_full_path()
+    )
+
+
+def _stream_products(request, fields):
+    # Walk the catalog in keyset-ordered chunks so the dump never holds more
+    # than one chunk in memory, whatever the database driver does with cursors.
+    chunk_size = getattr(settings, 'CATALOG_STREAM_CHUNK_SIZE', 500)
+    media = media_urls(request)
+    last_id = 0
+    separator = b''
+    yield b'['
+    while True:
+        chunk = Product.objects.filter(id__gt=last_id).only(*fields).order_by('id')[:chunk_size]
+        count = 0
+        parts = []
+        for product in chunk.iterator(chunk_size=chunk_size):
+            parts.append(separator + dumps(product_data(product, media, fields)))
+            separator = b','
+            last_id = product.id
+            count += 1
+        if parts:
+            yield b''.join(parts)
+        if count < chunk_size:
+            break
+    yield b']'
+
+
+def _product_page_query(request, fields):
+    # Shared with the async view: raises ValueError with the client-facing message.
+    try:
+        limit = parse_limit(request)
+    except ValueError:
+        raise ValueError('limit must be a positive integer')
+
+    products = Product.objects.only(*fields).order_by('id')
+    cursor = request.GET.get('cursor')
+    if cursor:
+        try:
+            last_id, = decode_cursor(cursor, 1)
+            products = products.filter(id__gt=int(last_id))
+        except (InvalidCursor, TypeError, ValueError):
+            raise ValueError('Invalid cursor')
+
+    variant = f"{request.build_absolute_uri('/')}|{cursor or ''}|{limit}|{','.join(fields)}"
+    return products, limit, variant
+
+
+def _product_page_body(request, page, limit, fields):
+    # ``page`` holds up to limit + 1 products; the extra one means there is a next page.
+    next_cursor = None
+    if len(page) > limit:
+        page = page[:limit]
+        next_cursor = encode_cursor(page[-1].id)
+    with span('serialize'):
+        media = media_urls(request)
+        return dumps({
+            'results': [product_data(product, media, fields) for product in page],
+            'next': next_cursor
+        })
+
+
 @csrf_exempt
+@replica_reads
+@etag(_catalog_etag)
 def product_list(request):
     if request.method == 'GET':
-        products = Product.objects.all()
-        data = []
-        for product in products:
-            data.append({
-                'id': product.id,
-                'name': product.name,
-                'price': str(product.price),
-                'description': product.description,
-                'image': request.build_absolute_uri(product.image.url) if product.image else None
-            })
-        return JsonResponse(data, safe=False)
+        try:
+            fields = parse_fields(request, PRODUCT_FIELDS)
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+
+        if request.GET.get('stream') in ('1', 'true'):
+            return StreamingHttpResponse(
+                _stream_products(request, fields),
+                content_type='application/json'
+            )
+
+        try:
+            products, limit, variant = _product_page_query(request, fields)
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+
+        def build_page():
+            return _product_page_body(request, list(products[:limit + 1]), limit, fields)
+
+        encoding = negotiate_encoding(request)
+        body = cached_catalog_page(variant, build_page, encoding, _catalog_version(request))
+        return encoded_response(body, encoding)
+
+    return JsonResponse({'error': 'Only GET method is allowed'}, status=405)
 
 
 
 @csrf_exempt
-def add_to_cart(request):
+@replica_reads
+@etag(_catalog_etag)
+def product_search(request):
+    if request.method == 'GET':
+        query = request.GET.get('q', '').strip()
+        if not query:
+            return JsonResponse({'error': 'q is required'}, status=400)
+
+        try:
+            limit = parse_limit(request)
+        except ValueError:
+            return JsonResponse({'error': 'limit must be a positive integer'}, status=400)
+
+        offset = 0
+        cursor = request.GET.get('cursor')
+        if cursor:
+            try:
+                offset, = decode_cursor(cursor, 1)
+                offset = int(offset)
+                if offset < 0:
+                    raise InvalidCursor(cursor)
+            except (InvalidCursor, TypeError, ValueError):
+                return JsonResponse({'error': 'Invalid cursor'}, status=400)
+
+        def build_page():
+            products, has_more = search_products(query, offset, limit)
+            with span('serialize'):
+                media = media_urls(request)
+                results = []
+                for product in products:
+                    data = product_data(product, media)
+                    data['score'] = product.score
+                    results.append(data)
+                return dumps({
+                    'results': results,
+                    'next': encode_cursor(offset + limit) if has_more else None
+                })
+
+        variant = f"search|{request.build_absolute_uri('/')}|{query.lower()}|{offset}|{limit}"
+        encoding = negotiate_encoding(request)
+        body = cached_catalog_page(variant, build_page, encoding, _catalog_version(request))
+        return encoded_response(body, encoding)
+
+    return JsonResponse({'error': 'Only GET method is allowed'}, status=405)
+
+
+
+IMPORT_CONTENT_TYPES = {
+    'text/csv': 'csv',
+    'application/jsonl': 'jsonl',
+    'application/x-ndjson': 'jsonl',
+    'application/x-jsonlines': 'jsonl',
+}
+
+
+@csrf_exempt
+@token_required
+def bulk_import_products(request):
     if request.method == 'POST':
         try:
-            auth_header = request.headers.get('Authorization')
-            if not auth_header or not auth_header.startswith('Token '):
-                return JsonResponse({'error': 'Token authentication required'}, status=401)
-            
-            token_key = auth_header.split(' ')[1]
+            if not request.user.is_staff:
+                return JsonResponse({'error': 'Staff access required'}, status=403)
+
+            if request.content_type.startswith('multipart/form-data'):
+                upload = request.FILES.get('file')
+                if upload is None:
+                    return JsonResponse({'error': 'file is required'}, status=400)
+                lines = upload
+                fmt = request.GET.get('format') or (
+                    'jsonl' if upload.name.endswith(('.jsonl', '.ndjson')) else 'csv'
+                )
+            else:
+                # Read the body line by line instead of through request.body,
+                # which would buffer the whole feed.
+                lines = request
+                fmt = request.GET.get('format') or IMPORT_CONTENT_TYPES.get(request.content_type)
+
+            if fmt not in FORMATS:
+                return JsonResponse({'error': 'Unsupported import format'}, status=400)
+
             try:
-                token = Token.objects.get(key=token_key)
-                user = token.user
-            except Token.DoesNotExist:
-                return JsonResponse({'error': 'Invalid token'}, status=401)
+                batch_size = int(request.GET.get('batch_size') or 0) or None
+            except ValueError:
+                return JsonResponse({'error': 'batch_size must be a number'}, status=400)
+
+            result = import_products(lines, fmt, batch_size=batch_size)
+            return JsonResponse({'success': True, **result.as_dict()})
+
+        except UnicodeDecodeError:
+            return JsonResponse({'error': 'Import file must be UTF-8 encoded'}, status=400)
+        except Exception as e:
+            return JsonResponse({'error': str(e)}, status=500)
+
+    return JsonResponse({'error': 'Only POST method is allowed'}, status=405)
+
+
+
+def _increment_cart_item(user, product, quantity):
+    """Add ``quantity`` to the user's cart line for ``product`` without a
+    read-modify-write.
+
+    The UPDATE runs first because the line usually exists; a racing INSERT
+    of the same line trips the (user, product) unique constraint and falls
+    back to the UPDATE. Returns True when a new line was created.
+    """
+    lines = Cart.objects.filter(user=user, product=product)
+    if lines.update(quantity=F('quantity') + quantity):
+        return False
+    try:
+        with transaction.atomic():
+            Cart.objects.create(user=user, product=product, quantity=quantity)
+        return True
+    except IntegrityError:
+        lines.update(quantity=F('quantity') + quantity)
+        return False
+
+
+def _set_cart_item(user, product, quantity):
+    """Set (or with 0, remove) the user's cart line for ``product`` and keep
+    the cart summary in step. Returns the previous quantity (0 if none).
+
+    Must run inside a transaction: the line is locked so the summary delta
+    is computed from the quantity actually replaced.
+    """
+    line = Cart.objects.filter(user=user, product=product).select_for_update().first()
+    previous = line.quantity if line else 0
+    if line is None:
+        if quantity > 0:
+            try:
+                with transaction.atomic():
+                    Cart.objects.create(user=user, product=product, quantity=quantity)
+            except IntegrityError:
+                # Lost the race to a concurrent insert; take over its line.
+                return _set_cart_item(user, product, quantity)
+    elif quantity == 0:
+        line.delete()
+    else:
+        Cart.objects.filter(pk=line.pk).update(quantity=quantity)
+
+    lines = (quantity > 0) - (previous > 0)
+    apply_cart_delta(user.id, lines=lines, amount=product.price * (quantity - previous))
+    return previous
+
+
+@csrf_exempt
+@token_required
+def add_to_cart(request):
+    if request.method == 'POST':
+        try:
+            user = request.user
 
             data = json.loads(request.body)
             product_id = data.get('product_id')
@@ -138,18 +397,13 @@ def add_to_cart(request):
             if not product_id:
                 return JsonResponse({'error': 'product_id is required'}, status=400)
             
+            quantity = int(quantity)
             product = get_object_or_404(Product, id=product_id)
-            
-            cart_item, created = Cart.objects.get_or_create(
-                user=user,
-                product=product,
-                defaults={'quantity': quantity}
-            )
-            
-            if not created:
-                cart_item.quantity += int(quantity)
-                cart_item.save()
-                
+            with transaction.atomic():
+                created = _increment_cart_item(user, product, quantity)
+                apply_cart_delta(user.id, lines=int(created), amount=product.price * quantity)
+
+            bump_cart_revision(user.id)
             return JsonResponse({'success': True})
         
         except json.JSONDecodeError:
@@ -157,56 +411,70 @@ def add_to_cart(request):
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=500)
 
+    return JsonResponse({'error': 'Only POST method is allowed'}, status=405)
+
+
+
+
+CENTS = Decimal('0.01')
 
 
+def _cart_rows(user, fields=tuple(CART_LINE_FIELDS)):
+    # One joined query: line totals, the cart total and the line count are all
+    # computed by the database (the latter two as window aggregates per row).
+    money = DecimalField(max_digits=12, decimal_places=2)
+    line_total = ExpressionWrapper(F('product__price') * F('quantity'), output_field=money)
+    rows = (
+        Cart.objects.filter(user=user)
+        .order_by('id')
+        .annotate(
+            item_total=line_total,
+            cart_total=Window(Sum(line_total), output_field=money),
+            line_count=Window(Count('id')),
+        )
+        .values(*(CART_LINE_FIELDS[name] for name in fields), 'cart_total', 'line_count')
+    )
+    return rows
+
+
+def _cart_body(request, rows, fields=tuple(CART_LINE_FIELDS)):
+    media = media_urls(request)
+    data = []
+    total = 0
+    count = 0
+    for row in rows:
+        total = row['cart_total'].quantize(CENTS)
+        count = row['line_count']
+        if 'item_total' in row:
+            row['item_total'] = row['item_total'].quantize(CENTS)
+        data.append(cart_line_data(row, media, fields))
+
+    return {
+        'success': True,
+        'items': data,
+        'total': str(total),
+        'count': count
+    }
+
+
+def _cart_payload(request, user, fields=tuple(CART_LINE_FIELDS)):
+    return _cart_body(request, list(_cart_rows(user, fields)), fields)
+
 
 @csrf_exempt
+@token_required
+@replica_reads
+@etag(_cart_etag)
 def view_cart(request):
     if request.method == 'GET':
         try:
-            auth_header = request.headers.get('Authorization')
-            if not auth_header or not auth_header.startswith('Token '):
-                return JsonResponse({'error': 'Token authentication required'}, status=401)
-            
-            token_key = auth_header.split(' ')[1]
             try:
-                token = Token.objects.get(key=token_key)
-                user = token.user
-            except Token.DoesNotExist:
-                return JsonResponse({'error': 'Invalid token'}, status=401)
-
-            cart_items = Cart.objects.filter(user=user)
-            data = []
-            total = 0
-            
-            for item in cart_items:
-                try:
-                    item_total = item.product.price * item.quantity
-                    total += item_total
-                    
-                    image_url = None
-                    if item.product.image:
-                        image_url = request.build_absolute_uri(item.product.image.url)
-                    
-                    data.append({
-                        'id': item.id,
-                        'product_id': item.product.id,
-                        'product_name': item.product.name,
-                        'price': str(item.product.price),
-                        'quantity': item.quantity,
-                        'item_total': str(item_total),
-                        'image': image_url
-                    })
-                except Exception as e:
-                    continue
-            
-            return JsonResponse({
-                'success': True,
-                'items': data,
-                'total': str(total),
-                'count': len(data)
-            })
-            
+                fields = parse_fields(request, CART_LINE_FIELDS)
+            except ValueError as e:
+                return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+            return JsonResponse(_cart_payload(request, request.user, fields))
+
         except Exception as e:
             return JsonResponse({
                 'success': False,
@@ -219,28 +487,158 @@ def view_cart(request):
 
 
 
+@csrf_exempt
+@token_required
+@etag(_cart_etag)
+def cart_summary(request):
+    if request.method == 'GET':
+        try:
+            summary = CartSummary.objects.filter(user=request.user).first()
+            if summary is None:
+                rebuild_cart_summaries([request.user.id])
+                summary = CartSummary.objects.get(user=request.user)
+
+            return JsonResponse({
+                'success': True,
+                'count': summary.line_count,
+                'total': str(summary.total.quantize(CENTS)) if summary.line_count else '0'
+            })
+
+        except Exception as e:
+            return JsonResponse({'success': False, 'error': str(e)}, status=500)
+
+    return JsonResponse({'error': 'Only GET method is allowed'}, status=405)
+
+
+
+CART_BATCH_OPERATIONS = ('add', 'set', 'remove')
+
+
+def _parse_cart_operations(data):
+    operations = data.get('operations') if isinstance(data, dict) else None
+    if not isinstance(operations, list) or not operations:
+        raise ValueError('operations must be a non-empty list')
+    if len(operations) > getattr(settings, 'CART_BATCH_MAX_OPERATIONS', 500):
+        raise ValueError('Too many operations')
+
+    parsed = []
+    for index, operation in enumerate(operations):
+        if not isinstance(operation, dict) or operation.get('op') not in CART_BATCH_OPERATIONS:
+            raise ValueError(f'operations[{index}]: op must be one of add, set, remove')
+        op = operation['op']
+        try:
+            product_id = int(operation.get('product_id'))
+            quantity = 0 if op == 'remove' else int(operation.get('quantity', 1 if op == 'add' else None))
+        except (TypeError, ValueError):
+            raise ValueError(f'operations[{index}]: product_id and quantity must be numbers')
+        if quantity < (1 if op == 'add' else 0):
+            raise ValueError(f'operations[{index}]: invalid quantity')
+        parsed.append((op, product_id, quantity))
+    return parsed
+
+
+def _locked_cart_lines(user):
+    return {item.product_id: item for item in Cart.objects.filter(user=user).select_for_update().order_by('id')}
+
+
+def _apply_cart_operations(user, operations, retry=True):
+    """Apply parsed batch ``operations`` to the user's cart in one transaction.
+
+    Existing lines are locked, but a line can still be inserted by another
+    request meanwhile: ``add_to_cart`` takes no lock. The batch's insert of
+    that line then trips the (user, product) constraint, and the batch
+    starts over once with the line locked.
+    """
+    try:
+        with transaction.atomic():
+            rows = _locked_cart_lines(user)
+            quantities = {product_id: item.quantity for product_id, item in rows.items()}
+            for op, product_id, quantity in operations:
+                if op == 'add':
+                    quantities[product_id] = quantities.get(product_id, 0) + quantity
+                else:
+                    quantities[product_id] = quantity
+
+            to_create = []
+            to_update = []
+            to_delete = []
+            for product_id, quantity in quantities.items():
+                item = rows.get(product_id)
+                if item is None:
+                    if quantity > 0:
+                        to_create.append(Cart(user=user, product_id=product_id, quantity=quantity))
+                elif quantity == 0:
+                    to_delete.append(item.pk)
+                elif quantity != item.quantity:
+                    item.quantity = quantity
+                    to_update.append(item)
+
+            if to_create:
+                Cart.objects.bulk_create(to_create)
+            if to_update:
+                Cart.objects.bulk_update(to_update, ['quantity'])
+            if to_delete:
+                Cart.objects.filter(pk__in=to_delete).delete()
+            rebuild_cart_summaries([user.id])
+    except IntegrityError:
+        if not retry:
+            raise
+        _apply_cart_operations(user, operations, retry=False)
+
+
+@csrf_exempt
+@token_required
+def batch_update_cart(request):
+    if request.method == 'POST':
+        try:
+            user = request.user
+
+            try:
+                operations = _parse_cart_operations(json.loads(request.body))
+            except json.JSONDecodeError:
+                return JsonResponse({'success': False, 'error': 'Invalid JSON data'}, status=400)
+            except ValueError as e:
+                return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+            product_ids = {product_id for _, product_id, _ in operations}
+            known_ids = set(Product.objects.filter(id__in=product_ids).values_list('id', flat=True))
+            missing = sorted(product_ids - known_ids)
+            if missing:
+                return JsonResponse(
+                    {'success': False, 'error': 'Product not found', 'product_ids': missing},
+                    status=404
+                )
+
+            _apply_cart_operations(user, operations)
+            bump_cart_revision(user.id)
+            return JsonResponse(_cart_payload(request, user))
+
+        except Exception as e:
+            return JsonResponse({'success': False, 'error': str(e)}, status=500)
+
+    return JsonResponse({'success': False, 'error': 'Only POST method is allowed'}, status=405)
+
+
+
 
 
 @csrf_exempt
+@token_required
 def remove_from_cart(request, item_id):
     if request.method == 'DELETE':
         try:
-            auth_header = request.headers.get('Authorization')
-            if not auth_header or not auth_header.startswith('Token '):
-                return JsonResponse({'error': 'Token authentication required'}, status=401)
-            
-            token_key = auth_header.split(' ')[1]
-            try:
-                token = Token.objects.get(key=token_key)
-                user = token.user
-            except Token.DoesNotExist:
-                return JsonResponse({'error': 'Invalid token'}, status=401)
+            user = request.user
+
+            cart_item = get_object_or_404(Cart.objects.select_related('product'), id=item_id, user=user)
+
+            with transaction.atomic():
+                deleted, _ = Cart.objects.filter(pk=cart_item.pk).delete()
+                if deleted:
+                    apply_cart_delta(
+                        user.id, lines=-1, amount=-cart_item.product.price * cart_item.quantity
+                    )
+            bump_cart_revision(user.id)
 
-            cart_item = get_object_or_404(Cart, id=item_id, user=user)
-            
-        
-            cart_item.delete()
-            
             return JsonResponse({
                 'success': True,
                 'message': 'Item removed from cart successfully',
@@ -260,25 +658,11 @@ def remove_from_cart(request, item_id):
 
 
 @csrf_exempt
+@token_required
 def update_cart_item(request, product_id):
     if request.method == 'PUT':
         try:
-            auth_header = request.headers.get('Authorization')
-            if not auth_header or not auth_header.startswith('Token '):
-                return JsonResponse(
-                    {'success': False, 'error': 'Token authentication required'}, 
-                    status=401
-                )
-            
-            token_key = auth_header.split(' ')[1]
-            try:
-                token = Token.objects.get(key=token_key)
-                user = token.user
-            except Token.DoesNotExist:
-                return JsonResponse(
-                    {'success': False, 'error': 'Invalid token'}, 
-                    status=401
-                )
+            user = request.user
 
             try:
                 data = json.loads(request.body)
@@ -298,26 +682,19 @@ def update_cart_item(request, product_id):
                     )
                 
                 product = get_object_or_404(Product, id=product_id)
-                cart_item, created = Cart.objects.get_or_create(
-                    user=user,
-                    product=product,
-                    defaults={'quantity': quantity}
-                )
-                
-                if not created:
-                    if quantity == 0:
-                        cart_item.delete()
-                        return JsonResponse({
-                            'success': True,
-                            'action': 'removed',
-                            'product_id': product_id,
-                            'quantity': 0,
-                            'message': 'Item removed from cart'
-                        })
-                    else:
-                        cart_item.quantity = quantity
-                        cart_item.save()
-                
+                with transaction.atomic():
+                    previous = _set_cart_item(user, product, quantity)
+                if previous or quantity:
+                    bump_cart_revision(user.id)
+                if previous and quantity == 0:
+                    return JsonResponse({
+                        'success': True,
+                        'action': 'removed',
+                        'product_id': product_id,
+                        'quantity': 0,
+                        'message': 'Item removed from cart'
+                    })
+
                 response_data = {
                     'success': True,
                     'action': 'updated' if quantity > 0 else 'removed',
@@ -326,7 +703,7 @@ def update_cart_item(request, product_id):
                     'quantity': quantity,
                     'unit_price': str(product.price),
                     'item_total': str(product.price * quantity),
-                    'image': request.build_absolute_uri(product.image.url) if product.image else None
+                    'image': media_urls(request)(product.image.name)
                 }
                 
                 return JsonResponse(response_data)
@@ -362,44 +739,71 @@ def update_cart_item(request, product_id):
 
 
 
+def _job_data(job):
+    return {
+        'ticket': str(job.ticket),
+        'status': job.status,
+        'total_amount': str(job.total_amount),
+        'order_id': job.order_id,
+        'error': job.error or None,
+        'created_at': job.created_at.strftime('%Y-%m-%d %H:%M:%S'),
+    }
+
+
+def _queue_order(request):
+    # ORDER_CHECKOUT_QUEUE: snapshot the cart into a job for process_orders
+    # instead of placing the order inside the request.
+    job, _ = enqueue_order(request.user)
+    if job is None:
+        return JsonResponse({'error': 'Cart is empty'}, status=400)
+    status_url = reverse('order_status', args=[job.ticket])
+    return JsonResponse(
+        {'success': True, **_job_data(job), 'status_url': status_url},
+        status=202,
+        headers={'Location': status_url}
+    )
+
+
 @csrf_exempt
+@token_required
 def place_order(request):
     if request.method == 'POST':
         try:
-            
-            auth_header = request.headers.get('Authorization')
-            if not auth_header or not auth_header.startswith('Token '):
-                return JsonResponse({'error': 'Token authentication required'}, status=401)
-            
-            token_key = auth_header.split(' ')[1]
-            try:
-                token = Token.objects.get(key=token_key)
-                user = token.user
-            except Token.DoesNotExist:
-                return JsonResponse({'error': 'Invalid token'}, status=401)
+            user = request.user
+            if getattr(settings, 'ORDER_CHECKOUT_QUEUE', False):
+                return _queue_order(request)
 
-            
-            cart_items = Cart.objects.filter(user=user)
-            if not cart_items.exists():
-                return JsonResponse({'error': 'Cart is empty'}, status=400)
-                
-            total_amount = sum(item.product.price * item.quantity for item in cart_items)
-            
+            # Fixed-size checkout: lock and read the cart with its products,
+            # insert the order and its lines in bulk, then clear the cart.
             with transaction.atomic():
+                lock_of = ('self',) if connection.features.has_select_for_update_of else ()
+                cart_items = list(
+                    Cart.objects.filter(user=user)
+                    .select_related('product')
+                    .select_for_update(of=lock_of)
+                )
+                if not cart_items:
+                    return JsonResponse({'error': 'Cart is empty'}, status=400)
+
+                total_amount = sum(item.product.price * item.quantity for item in cart_items)
                 order = Order.objects.create(
                     user=user,
                     total_amount=total_amount
                 )
-                
-                for item in cart_items:
-                    OrderItem.objects.create(
+                OrderItem.objects.bulk_create([
+                    OrderItem(
                         order=order,
                         product=item.product,
                         quantity=item.quantity,
                         price=item.product.price
                     )
-                    item.delete()
-                
+                    for item in cart_items
+                ])
+                Cart.objects.filter(pk__in=[item.pk for item in cart_items]).delete()
+                apply_cart_delta(user.id, lines=-len(cart_items), amount=-total_amount)
+
+            bump_cart_revision(user.id)
+            bump_order_revision(user.id)
             return JsonResponse({
                 'success': True,
                 'order_id': order.id,
@@ -415,50 +819,86 @@ def place_order(request):
 
 
 @csrf_exempt
+@token_required
+def order_status(request, ticket):
+    if request.method == 'GET':
+        job = OrderJob.objects.filter(ticket=ticket, user=request.user).first()
+        if job is None:
+            return JsonResponse({'error': 'Order ticket not found'}, status=404)
+        return JsonResponse({'success': True, **_job_data(job)})
+
+    return JsonResponse({'error': 'Only GET method is allowed'}, status=405)
+
+
+
+def _order_history_query(request, user):
+    # Shared with the async view: raises ValueError with the client-facing message.
+    try:
+        limit = parse_limit(request)
+    except ValueError:
+        raise ValueError('limit must be a positive integer')
+
+    fields = parse_fields(request, ORDER_FIELDS)
+    if request.GET.get('summary') in ('1', 'true'):
+        fields = tuple(name for name in fields if name != 'items')
+
+    # id and created_at are always loaded: the cursor is built from them.
+    columns = {'id', 'created_at'}.union(ORDER_FIELDS[name] for name in fields if ORDER_FIELDS[name])
+    orders = Order.objects.filter(user=user).only(*columns).order_by('-created_at', '-id')
+
+    cursor = request.GET.get('cursor')
+    if cursor:
+        try:
+            created_at, last_id = decode_cursor(cursor, 2)
+            created_at = parse_datetime(created_at)
+            if created_at is None:
+                raise InvalidCursor(cursor)
+            orders = orders.filter(
+                Q(created_at__lt=created_at) |
+                Q(created_at=created_at, id__lt=int(last_id))
+            )
+        except (InvalidCursor, TypeError, ValueError):
+            raise ValueError('Invalid cursor')
+
+    if 'items' in fields:
+        orders = orders.prefetch_related(Prefetch(
+            'items',
+            queryset=OrderItem.objects.select_related('product')
+            .only('order_id', 'quantity', 'price', 'product__name')
+            .order_by('id')
+        ))
+    return orders, limit, fields
+
+
+def _order_history_body(page, limit, fields):
+    next_cursor = None
+    if len(page) > limit:
+        page = page[:limit]
+        next_cursor = encode_cursor(page[-1].created_at.isoformat(), page[-1].id)
+
+    data = [order_data(order, fields) for order in page]
+    return {
+        'success': True,
+        'orders': data,
+        'count': len(data),
+        'next': next_cursor
+    }
+
+
+@csrf_exempt
+@token_required
+@replica_reads
+@etag(_order_history_etag)
 def order_history(request):
     if request.method == 'GET':
         try:
-            
-            auth_header = request.headers.get('Authorization')
-            if not auth_header or not auth_header.startswith('Token '):
-                return JsonResponse({'error': 'Token authentication required'}, status=401)
-            
-            token_key = auth_header.split(' ')[1]
             try:
-                token = Token.objects.get(key=token_key)
-                user = token.user
-            except Token.DoesNotExist:
-                return JsonResponse({'error': 'Invalid token'}, status=401)
+                orders, limit, fields = _order_history_query(request, request.user)
+            except ValueError as e:
+                return JsonResponse({'error': str(e)}, status=400)
+
+            return JsonResponse(_order_history_body(list(orders[:limit + 1]), limit, fields))
 
-            orders = Order.objects.filter(user=user).order_by('-created_at')
-            data = []
-            
-            for order in orders:
-                items = []
-                for item in order.items.all():
-                    items.append({
-                        'product_id': item.product.id,
-                        'product_name': item.product.name,
-                        'quantity': item.quantity,
-                        'price': str(item.price),
-                        'item_total': str(item.price * item.quantity)
-                    })
-                    
-                order_data = {
-                    'order_id': order.id,
-                    'total_amount': str(order.total_amount),
-                    'created_at': order.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-                    'items': items
-                }
-                
-                data.append(order_data)
-                
-            return JsonResponse({
-                'success': True,
-                'orders': data,
-                'count': len(data)
-            }, safe=False)
-            
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=500)
     
@@ -466,6 +906,81 @@ def order_history(request):
 
 
 
+def serve_media(request, path):
+    if request.method not in ('GET', 'HEAD'):
+        return JsonResponse({'error': 'Only GET method is allowed'}, status=405)
+
+    # Hidden files include uploads still being written (``.upload-*``).
+    if any(part.startswith('.') for part in path.replace('\\', '/').split('/')):
+        raise Http404(path)
+
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+        info = os.stat(full_path)
+    except (OSError, SuspiciousFileOperation):
+        raise Http404(path)
+    if not stat.S_ISREG(info.st_mode):
+        raise Http404(path)
+
+    etag = file_etag(info)
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(info.st_mtime),
+        'Cache-Control': cache_control(path),
+        'Accept-Ranges': 'bytes',
+    }
+    response = get_conditional_response(request, etag=etag, last_modified=int(info.st_mtime))
+    if response is not None:
+        for header, value in headers.items():
+            response[header] = value
+        return response
+
+    content_type = mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+
+    # The proxy serves ranges itself from the file it is pointed at.
+    offload = offload_headers(path, full_path)
+    if offload is not None:
+        return HttpResponse(content_type=content_type, headers={**headers, **offload})
+
+    try:
+        byte_range = parse_range(request, info.st_size, etag, info.st_mtime)
+    except ValueError:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{info.st_size}'
+        return response
+
+    if byte_range is None:
+        return FileResponse(open(full_path, 'rb'), content_type=content_type, headers=headers)
+
+    start, end = byte_range
+    response = StreamingHttpResponse(
+        iter_range(full_path, start, end - start + 1), status=206, content_type=content_type, headers=headers
+    )
+    response['Content-Range'] = f'bytes {start}-{end}/{info.st_size}'
+    response['Content-Length'] = str(end - start + 1)
+    return response
+
+
+
+@csrf_exempt
+def metrics(request):
+    if request.method == 'GET':
+        user = request.user
+        auth_header = request.headers.get('Authorization', '')
+        if auth_header.startswith('Token '):
+            user = resolve_token(auth_header[len('Token '):].strip())
+
+        if user is None or not user.is_authenticated:
+            return JsonResponse({'error': 'Authentication required'}, status=401)
+        if not user.is_staff:
+            return JsonResponse({'error': 'Staff access required'}, status=403)
+
+        return HttpResponse(metrics_registry.render(), content_type='text/plain; version=0.0.4')
+
+    return JsonResponse({'error': 'Only GET method is allowed'}, status=405)
+
+
+
 @csrf_exempt
 def register_user(request):
     if request.method == 'POST':